@@ -90,7 +90,7 @@ if __name__ == "__main__":
         include_package_data=True,
         package_data={"wireviz": get_package_data()},
         entry_points={
-            "console_scripts": ["wireviz=wireviz.wireviz:main"],
+            "console_scripts": ["wireviz=wireviz.wv_cli:main"],
         },
         python_requires=">=3.7",
         setup_requires=get_dependencies("setup_requires.txt"),
@@ -1,12 +1,67 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from typing import Optional, List, Any, Union
+import copy
+import sys
+from functools import lru_cache
+from typing import Optional, List, Any, Sequence, Union
 from dataclasses import dataclass, field, InitVar
 from pathlib import Path
 from wireviz.wv_helper import int2tuple, aspect_ratio
 from wireviz import wv_colors
 
+# Part strings repeated by many connectors and cables share one object
+INTERNED_FIELDS = ('name', 'manufacturer', 'mpn', 'pn', 'category', 'type',
+                   'subtype', 'color')
+
+
+def _intern_fields(part) -> None:
+    for name in INTERNED_FIELDS:
+        value = getattr(part, name, None)
+        if type(value) is str:
+            setattr(part, name, sys.intern(value))
+
+
+# Connectors and cables hold immutable tuples, so that equal sequences, e.g.
+# the default pins of every autogenerated connector, can be shared.
+@lru_cache(maxsize=None)
+def _default_pins(pincount: int) -> tuple:
+    return tuple(range(1, pincount + 1))
+
+
+@lru_cache(maxsize=None)
+def _default_pinlabels(pincount: int) -> tuple:
+    return ('', ) * pincount
+
+
+def _pin_indexes(pins: tuple, pinlabels: tuple) -> tuple:
+    # Indexes for resolving pins and pinlabels in constant time:
+    # pin -> position, label -> pin of its first occurrence, and the set of
+    # labels that occur more than once
+    pin_index = {pin: i for i, pin in enumerate(pins)}
+    pinlabel_index = {}
+    duplicate_pinlabels = set()
+    for pin, pinlabel in zip(pins, pinlabels):
+        if pinlabel in pinlabel_index:
+            duplicate_pinlabels.add(pinlabel)
+        else:
+            pinlabel_index[pinlabel] = pin
+    return pin_index, pinlabel_index, duplicate_pinlabels
+
+
+@lru_cache(maxsize=None)
+def _default_pin_indexes(pincount: int) -> tuple:
+    # Shared by all connectors with default pins and pinlabels; never modified
+    return _pin_indexes(_default_pins(pincount), _default_pinlabels(pincount))
+
+
+@lru_cache(maxsize=1024)
+def _color_sequence(colors: tuple, wirecount: int) -> tuple:
+    # colors repeated or cut off to wirecount wires
+    if wirecount > len(colors):
+        colors = colors * (wirecount // len(colors) + 1)
+    return colors[:wirecount]
+
 
 @dataclass
 class Image:
@@ -64,14 +119,14 @@ class Connector:
     pincount: Optional[int] = None
     image: Optional[Image] = None
     notes: Optional[str] = None
-    pinlabels: List[Any] = field(default_factory=list)
-    pins: List[Any] = field(default_factory=list)
+    pinlabels: Sequence[Any] = field(default_factory=tuple)
+    pins: Sequence[Any] = field(default_factory=tuple)
     color: Optional[str] = None
     show_name: bool = None
     show_pincount: bool = None
     hide_disconnected_pins: bool = False
     autogenerate: bool = False
-    loops: List[Any] = field(default_factory=list)
+    loops: Sequence[Any] = field(default_factory=tuple)
 
     def __post_init__(self):
 
@@ -103,13 +158,20 @@ class Connector:
 
         # create default lists for pins (sequential) and pinlabels (blank)
         # if not specified
-        if not self.pins:
-            self.pins = list(range(1, self.pincount + 1))
-        if not self.pinlabels:
-            self.pinlabels = [''] * self.pincount
-
-        if len(self.pins) != len(set(self.pins)):
+        if not self.pins and not self.pinlabels:
+            self.pins = _default_pins(self.pincount)
+            self.pinlabels = _default_pinlabels(self.pincount)
+            indexes = _default_pin_indexes(self.pincount)
+        else:
+            self.pins = (tuple(self.pins) if self.pins
+                         else _default_pins(self.pincount))
+            self.pinlabels = (tuple(self.pinlabels) if self.pinlabels
+                              else _default_pinlabels(self.pincount))
+            indexes = _pin_indexes(self.pins, self.pinlabels)
+        self.pin_index, self.pinlabel_index, self.duplicate_pinlabels = indexes
+        if len(self.pin_index) != len(self.pins):
             raise Exception('Pins are not unique')
+        _intern_fields(self)
 
         # hide auto-generated designators by default
         if self.show_name is None:
@@ -126,6 +188,38 @@ class Connector:
             # TODO: include properties of wire used to create the loop
             if len(loop) != 2:
                 raise Exception('Loops must be between exactly two pins!')
+        self.loops = tuple(tuple(loop) for loop in self.loops)
+
+    def clone(self, name: str) -> 'Connector':
+        """Return a copy named name, e.g. of an autogenerated connector.
+
+        Checking and building the fields is skipped: the copy shares them,
+        including pins, pinlabels, pin indexes and image, with this
+        connector, and only has its own connection state.
+        """
+        clone = copy.copy(self)
+        clone.name = sys.intern(name)
+        clone.ports_left = False
+        clone.ports_right = False
+        clone.visible_pins = {}
+        return clone
+
+    def resolve_pin(self, pin):
+        """Return the pin number of a pin number or unambiguous pin label."""
+        if pin not in self.pinlabel_index:
+            if pin not in self.pin_index:
+                raise Exception(f'{self.name}:{pin} not found.')
+            return pin
+        labelled_pin = self.pinlabel_index[pin]
+        if pin in self.pin_index and labelled_pin != pin:
+            raise Exception(f'{self.name}:{pin} is defined both in pinlabels '
+                            'and pins, for different pins.')
+        if pin in self.duplicate_pinlabels:
+            raise Exception(f'{self.name}:{pin} is defined more than once.')
+        # TODO: Maybe issue a warning when a pin is given by a label that
+        # is also a pin number? It's not worthy of an exception if it's
+        # unambiguous, but maybe risky?
+        return labelled_pin
 
     def activate_pin(self, pin):
         self.visible_pins[pin] = True
@@ -149,7 +243,7 @@ class Cable:
     shield: bool = False
     image: Optional[Image] = None
     notes: Optional[str] = None
-    colors: List[Any] = field(default_factory=list)
+    colors: Sequence[Any] = field(default_factory=tuple)
     color_code: Optional[str] = None
     show_name: bool = True
     show_wirecount: bool = True
@@ -208,19 +302,18 @@ class Cable:
                 self.colors = wv_colors.COLOR_CODES[self.color_code]
             # no colors defined, add dummy colors
             else:
-                self.colors = [''] * self.wirecount
-
-            # make color code loop around if more wires than colors
-            if self.wirecount > len(self.colors):
-                m = self.wirecount // len(self.colors) + 1
-                self.colors = self.colors * int(m)
-            # cut off excess after looping
-            self.colors = self.colors[:self.wirecount]
+                self.colors = ('', )
+
+            # make color code loop around if more wires than colors, and cut
+            # off excess after looping
+            self.colors = _color_sequence(tuple(self.colors), self.wirecount)
         else:  # wirecount implicit in length of color list
             if not self.colors:
                 raise Exception('Unknown number of wires. Must specify '
                                 'wirecount or colors (implicit length)')
             self.wirecount = len(self.colors)
+            self.colors = _color_sequence(tuple(self.colors), self.wirecount)
+        _intern_fields(self)
 
         # if lists of part numbers are provided check this is a bundle and that
         # it matches the wirecount.
@@ -236,21 +329,28 @@ class Cable:
                                     'bundles')
 
     def connect(self, from_name, from_pin, via_pin, to_name, to_pin):
+        self.connections.extend(self.make_connections(from_name, from_pin,
+                                                      via_pin, to_name,
+                                                      to_pin))
+
+    @staticmethod
+    def make_connections(from_name, from_pin, via_pin, to_name, to_pin):
+        """Return the Connections connect() adds, one per wire."""
         from_pin = int2tuple(from_pin)
         via_pin = int2tuple(via_pin)
         to_pin = int2tuple(to_pin)
         if len(from_pin) != len(to_pin):
             raise Exception('from_pin must have the same number of elements as '
                             'to_pin')
-        for i, _ in enumerate(from_pin):
-            # self.connections.append((from_name, from_pin[i], via_pin[i],
-            # to_name, to_pin[i]))
-            self.connections.append(Connection(from_name, from_pin[i],
-                                               via_pin[i], to_name, to_pin[i]))
+        return [Connection(from_name, from_pin[i], via_pin[i], to_name,
+                           to_pin[i]) for i, _ in enumerate(from_pin)]
 
 
 @dataclass
 class Connection:
+    # One per wire end, so without a __dict__
+    __slots__ = ('from_name', 'from_port', 'via_port', 'to_name', 'to_port')
+
     from_name: Any
     from_port: Any
     via_port: Any
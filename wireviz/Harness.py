@@ -1,14 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from collections import Counter
-from typing import List
+from itertools import chain, starmap
+from typing import TYPE_CHECKING, Any, List, Sequence
 from pathlib import Path
+import os
 import re
 
 from wireviz.DataClasses import (
     Connector,
-    Cable)
-from graphviz import Graph
+    Cable,
+    Connection)
 from wireviz import (
     wv_colors,
     __version__,
@@ -20,18 +21,35 @@ from wireviz.wv_helper import (
     mm2_equiv,
     m2in,
     in2m,
-    tuplelist2tsv,
+    write_tsv,
+    write_csv,
+    write_jsonl,
     nested_html_table,
     flatten2d,
+    html_bom_table,
     index_if_list,
     html_line_breaks,
     remove_line_breaks,
-    open_file_read,
     open_file_write,
     html_colorbar,
     html_image,
     html_caption,
     manufacturer_info_field)
+from wireviz.wv_render import render, pipe_formats, pipe_many
+from wireviz.wv_profile import count, get_profile, stage
+from wireviz.wv_cache import (
+    FragmentCache,
+    RenderCache,
+    fingerprint,
+    get_fragment_cache,
+    get_render_cache)
+
+if TYPE_CHECKING:
+    # imported on first use, so that e.g. BOM-only uses do not load it
+    from graphviz import Graph
+
+# Bump when the DOT statements generated for a node change
+FRAGMENT_FORMAT = 1
 
 
 class Harness:
@@ -42,14 +60,48 @@ class Harness:
         self.cables = {}
         self.additional_bom_items = []
         self.length_unit = 'm'
+        # The graph, rendered images and BOM are built on first use and kept
+        # until the harness is modified through one of the methods below, or
+        # color_mode or length_unit are changed. Modifying connectors or
+        # cables directly requires calling invalidate().
+        self._graph = None
+        self._rendered = {}
+        self._relative_images = None
+        self._bom = None
+        self._cache_key = None
+        # Persistent RenderCache; defaults to the configured cache directory
+        self.render_cache = None
+        # FragmentCache of the DOT statements of each node; defaults to
+        # get_fragment_cache()
+        self.fragment_cache = None
+
+    def invalidate(self) -> None:
+        self._graph = None
+        self._rendered = {}
+        self._relative_images = None
+        self._bom = None
+
+    def _check_cache(self) -> None:
+        key = (self.color_mode, self.length_unit)
+        if key != self._cache_key:
+            self.invalidate()
+            self._cache_key = key
 
     def add_connector(self, name: str, *args, **kwargs) -> None:
+        self.invalidate()
         self.connectors[name] = Connector(name, *args, **kwargs)
 
+    def add_connector_clone(self, name: str, prototype: Connector) -> None:
+        """Add a connector named name, cloned from prototype."""
+        self.invalidate()
+        self.connectors[name] = prototype.clone(name)
+
     def add_cable(self, name: str, *args, **kwargs) -> None:
+        self.invalidate()
         self.cables[name] = Cable(name, *args, **kwargs)
 
     def add_bom_item(self, item: dict) -> None:
+        self.invalidate()
         if 'length_unit' in item:
             self.length_unit = item['length_unit']
         else:
@@ -62,35 +114,12 @@ class Harness:
                 via_pin: (int, str),
                 to_name: str,
                 to_pin: (int, str)) -> None:
-        # check from and to connectors
-        for (name, pin) in zip([from_name, to_name], [from_pin, to_pin]):
-            if name is not None and name in self.connectors:
-                connector = self.connectors[name]
-                if pin in connector.pins and pin in connector.pinlabels:
-                    if connector.pins.index(pin) == \
-                       connector.pinlabels.index(pin):
-                        # TODO: Maybe issue a warning? It's not worthy of an
-                        # exception if it's unambiguous, but maybe risky?
-                        pass
-                    else:
-                        raise Exception(f'{name}:{pin} is defined both in '
-                                        'pinlabels and pins, for different '
-                                        'pins.')
-                if pin in connector.pinlabels:
-                    if connector.pinlabels.count(pin) > 1:
-                        raise Exception(f'{name}:{pin} is defined more than '
-                                        'once.')
-                    else:
-                        index = connector.pinlabels.index(pin)
-                        # map pin name to pin number
-                        pin = connector.pins[index]
-
-                        if name == from_name:
-                            from_pin = pin
-                        if name == to_name:
-                            to_pin = pin
-                if pin not in connector.pins:
-                    raise Exception(f'{name}:{pin} not found.')
+        self.invalidate()
+        # check from and to connectors, mapping pin labels to pin numbers
+        if from_name in self.connectors:
+            from_pin = self.connectors[from_name].resolve_pin(from_pin)
+        if to_name in self.connectors:
+            to_pin = self.connectors[to_name].resolve_pin(to_pin)
 
         self.cables[via_name].connect(from_name, from_pin, via_pin,
                                       to_name, to_pin)
@@ -99,7 +128,79 @@ class Harness:
         if to_name in self.connectors:
             self.connectors[to_name].activate_pin(to_pin)
 
-    def create_graph(self) -> Graph:
+    def connect_many(self,
+                     from_names: Sequence[str],
+                     from_pins: Sequence[Any],
+                     via_names: Sequence[str],
+                     via_pins: Sequence[Any],
+                     to_names: Sequence[str],
+                     to_pins: Sequence[Any]) -> None:
+        """Make many connections given as columns of connect() arguments.
+
+        The result is the same as calling connect() for every row in order,
+        except that no connection is made if any row is invalid.
+        """
+        length = len(via_names)
+        if any(len(column) != length for column in (from_names, from_pins,
+                                                    via_pins, to_names,
+                                                    to_pins)):
+            raise Exception('All connection columns must be the same length')
+        self.invalidate()
+
+        # check from and to connectors, mapping pin labels to pin numbers
+        from_pins = self._resolve_pins(from_names, from_pins)
+        to_pins = self._resolve_pins(to_names, to_pins)
+
+        # every row is checked before any connection is made
+        rows = zip(from_names, from_pins, via_pins, to_names, to_pins)
+        rows_by_cable = {}
+        for via_name, row in zip(via_names, rows):
+            rows_by_cable.setdefault(via_name, []).append(row)
+        cables = [self.cables[via_name] for via_name in rows_by_cable]
+        if any(isinstance(pin, tuple)
+               for pins in (from_pins, via_pins, to_pins) for pin in pins):
+            # multi-pin rows are expanded and checked like Cable.connect()
+            connections = [list(chain.from_iterable(
+                               starmap(Cable.make_connections, rows)))
+                           for rows in rows_by_cable.values()]
+        else:
+            connections = [starmap(Connection, rows)
+                           for rows in rows_by_cable.values()]
+        for cable, new in zip(cables, connections):
+            cable.connections.extend(new)
+
+        for names, pins in ((from_names, from_pins), (to_names, to_pins)):
+            pins_by_connector = {}
+            for name, pin in zip(names, pins):
+                pins_by_connector.setdefault(name, []).append(pin)
+            for name, pins in pins_by_connector.items():
+                if name in self.connectors:
+                    self.connectors[name].visible_pins.update(
+                        dict.fromkeys(pins, True))
+
+    def _resolve_pins(self, names: Sequence[str],
+                      pins: Sequence[Any]) -> List[Any]:
+        rows_by_connector = {}
+        for i, name in enumerate(names):
+            if name in self.connectors:
+                rows_by_connector.setdefault(name, []).append(i)
+        resolved = list(pins)
+        for name, rows in rows_by_connector.items():
+            resolve_pin = self.connectors[name].resolve_pin
+            for i in rows:
+                resolved[i] = resolve_pin(resolved[i])
+        return resolved
+
+    def create_graph(self) -> 'Graph':
+        # The returned graph is shared between callers; do not modify it.
+        self._check_cache()
+        if self._graph is None:
+            with stage('create_graph'):
+                self._graph = self._create_graph()
+        return self._graph
+
+    def _create_graph(self) -> 'Graph':
+        from graphviz import Graph
         dot = Graph()
         dot.body.append(f'// Graph generated by {APP_NAME} {__version__}')
         dot.body.append(f'// {APP_URL}')
@@ -124,71 +225,19 @@ class Harness:
                 if connection_color.to_port is not None:  # connect to right
                     self.connectors[connection_color.to_name].ports_left = True
 
-        for connector in self.connectors.values():
+        fragments = self.fragment_cache or get_fragment_cache()
+        salt = (FRAGMENT_FORMAT, __version__)
+        built = 0
 
-            html = []
-
-            rows = [[connector.name if connector.show_name else None],
-                    [f'P/N: {connector.pn}' if connector.pn else None,
-                     html_line_breaks(manufacturer_info_field(connector.manufacturer,  # noqa
-                                                              connector.mpn))],
-                    [html_line_breaks(connector.type),
-                     html_line_breaks(connector.subtype),
-                     f'{connector.pincount}-pin' if connector.show_pincount
-                        else None,
-                     connector.color, html_colorbar(connector.color)],
-                    '<!-- connector table -->' if connector.style != 'simple'
-                        else None,
-                    [html_image(connector.image)],
-                    [html_caption(connector.image)],
-                    [html_line_breaks(connector.notes)]]
-            html.extend(nested_html_table(rows))
-
-            if connector.style != 'simple':
-                pinhtml = []
-                pinhtml.append('<table border="0" cellspacing="0" '
-                               'cellpadding="3" cellborder="1">')
-
-                for pin, pinlabel in zip(connector.pins, connector.pinlabels):
-                    if (connector.hide_disconnected_pins and
-                            not connector.visible_pins.get(pin, False)):
-                        continue
-                    pinhtml.append('   <tr>')
-                    if connector.ports_left:
-                        pinhtml.append(f'    <td port="p{pin}l">{pin}</td>')
-                    if pinlabel:
-                        pinhtml.append(f'    <td>{pinlabel}</td>')
-                    if connector.ports_right:
-                        pinhtml.append(f'    <td port="p{pin}r">{pin}</td>')
-                    pinhtml.append('   </tr>')
-
-                pinhtml.append('  </table>')
-
-                html = [row.replace('<!-- connector table -->',
-                                    '\n'.join(pinhtml)) for row in html]
-
-            html = '\n'.join(html)
-            dot.node(connector.name,
-                     label=f'<\n{html}\n>',
-                     shape='none',
-                     margin='0',
-                     style='filled',
-                     fillcolor='white')
-
-            if len(connector.loops) > 0:
-                dot.attr('edge', color='#000000:#ffffff:#000000')
-                if connector.ports_left:
-                    loop_side = 'l'
-                    loop_dir = 'w'
-                elif connector.ports_right:
-                    loop_side = 'r'
-                    loop_dir = 'e'
-                else:
-                    raise Exception('No side for loops')
-                for loop in connector.loops:
-                    arg1 = f'{connector.name}:p{loop[0]}{loop_side}:{loop_dir}'
-                    arg2 = f'{connector.name}:p{loop[1]}{loop_side}:{loop_dir}'
-                    dot.edge(arg1, arg2)
+        for connector in self.connectors.values():
+            visible_pins = None
+            if connector.hide_disconnected_pins:
+                visible_pins = [pin for pin in connector.pins
+                                if connector.visible_pins.get(pin, False)]
+            key = fingerprint(salt, connector, connector.ports_left,
+                              connector.ports_right, visible_pins)
+            built += self._add_fragment(dot, fragments, key,
+                                        self._add_connector_node, connector)
 
         # determine if there are double- or triple-colored wires in the harness;
         # if so, pad single-color wires to make all wires of equal thickness
@@ -196,291 +245,595 @@ class Harness:
                   for colorstr in cable.colors)
 
         for cable in self.cables.values():
+            # the connectors' names and styles appear in the cable's edges
+            connectors = [(connector.name, connector.show_name,
+                           connector.style)
+                          for connector in map(self.connectors.get,
+                                               self._cable_ends(cable))]
+            key = fingerprint(salt, cable, cable.connections, connectors,
+                              self.color_mode, pad)
+            built += self._add_fragment(dot, fragments, key,
+                                        self._add_cable_node, cable, pad)
 
-            html = []
-
-            awg_fmt = ''
-            length_fmt = ''
-            if cable.show_equiv:
-                # Only convert units we actually know about, i.e. currently
-                # mm2 and awg --- other units _are_ technically allowed,
-                # and passed through as-is.
-                try:
-                    if cable.gauge_unit == 'mm\u00B2':
-                        awg_fmt = f' ({awg_equiv(cable.gauge)} AWG)'
-                    elif cable.gauge_unit.upper() == 'AWG':
-                        awg_fmt = f' ({mm2_equiv(cable.gauge)} mm\u00B2)'
-                except AttributeError:
-                    # show_equiv works for both wire gauge and length. Ignore
-                    # the case when AWG isn't specified
-                    pass
-
-                if cable.length_unit == 'in':
-                    length_fmt = f' ({in2m(cable.length):.3f} m)'
-                elif cable.length_unit == 'm':
-                    length_fmt = f' ({m2in(cable.length):.3f} in)'
-                else:
-                    raise Exception(f'Only m or in length units are supported, '
-                                    f'not {cable.length_unit}')
-
-            name = cable.name if cable.show_name else None
-
-            cable_pn = None
-            if cable.pn and not isinstance(cable.pn, list):
-                cable_pn = f'P/N: {cable.pn}'
-
-            cable_mfg = None
-            if not isinstance(cable.manufacturer, list):
-                cable_mfg = cable.manufacturer
-
-            cable_mpn = None
-            if not isinstance(cable.mpn, list):
-                cable_mpn = cable.mpn
-
-            mfg = manufacturer_info_field(cable_mfg, cable_mpn)
-
-            wirecount = f'{cable.wirecount}x' if cable.show_wirecount else None
-
-            gauge = None
-            if cable.gauge:
-                gauge = f'{cable.gauge} {cable.gauge_unit}{awg_fmt}'
-
-            shield = '+ S' if cable.shield else None
-
-            length = None
-            if cable.length > 0:
-                length = f'{cable.length} {cable.length_unit}{length_fmt}'
-
-            rows = [[name],
-                    [cable_pn,
-                     html_line_breaks(mfg)],
-                    [html_line_breaks(cable.type),
-                     wirecount,
-                     gauge,
-                     shield,
-                     length,
-                     cable.color,
-                     html_colorbar(cable.color)],
-                    '<!-- wire table -->',
-                    [html_image(cable.image)],
-                    [html_caption(cable.image)],
-                    [html_line_breaks(cable.notes)]]
-            html.extend(nested_html_table(rows))
-
-            wirehtml = []
-            # conductor table
-            wirehtml.append('<table border="0" cellspacing="0" cellborder="0">')
-            wirehtml.append('   <tr><td>&nbsp;</td></tr>')
-
-            for i, connection_color in enumerate(cable.colors, 1):
-                wirehtml.append('   <tr>')
-                wirehtml.append(f'    <td><!-- {i}_in --></td>')
-                wvcolors = wv_colors.translate_color(connection_color,
-                                                     self.color_mode)
-                wirehtml.append(f'    <td>{wvcolors}</td>')
-                wirehtml.append(f'    <td><!-- {i}_out --></td>')
-                wirehtml.append('   </tr>')
-
-                bgcolors = ['#000000']
-                bgcolors += get_color_hex(connection_color, pad=pad)
-                bgcolors += ['#000000']
-                wirehtml.append('   <tr>')
-                wirehtml.append('    <td colspan="3" border="0" '
-                                f'cellspacing="0" cellpadding="0" port="w{i}" '
-                                f'height="{(2 * len(bgcolors))}">')
-                wirehtml.append('     <table cellspacing="0" cellborder="0" '
-                                'border="0">')
-                # Reverse to match the curved wires when more than 2 colors
-                for j, bgcolor in enumerate(bgcolors[::-1]):
-                    color = bgcolor if bgcolor != "" else \
-                        wv_colors.default_color
-                    wirehtml.append('      <tr><td colspan="3" cellpadding="0" '
-                                    f'height="2" bgcolor="{color}" border="0">'
-                                    '</td></tr>')
-                wirehtml.append('     </table>')
-                wirehtml.append('    </td>')
-                wirehtml.append('   </tr>')
-                # for bundles individual wires can have part information
-                if(cable.category == 'bundle'):
-                    # create a list of wire parameters
-                    wireidentification = []
-                    if isinstance(cable.pn, list):
-                        wireidentification.append(f'P/N: {cable.pn[i - 1]}')
-                    mfg = None
-                    if isinstance(cable.manufacturer, list):
-                        mfg = cable.manufacturer[i - 1]
-                    mpn = None
-                    if isinstance(cable.mpn, list):
-                        mpn = cable.mpn[i - 1]
-                    mfg_info = manufacturer_info_field(mfg, mpn)
-                    if mfg_info:
-                        wireidentification.append(html_line_breaks(mfg_info))
-                    # print parameters into a table row under the wire
-                    if(len(wireidentification) > 0):
-                        wirehtml.append('   <tr><td colspan="3">')
-                        wirehtml.append('    <table border="0" cellspacing="0" '
-                                        'cellborder="0"><tr>')
-                        for attrib in wireidentification:
-                            wirehtml.append(f'     <td>{attrib}</td>')
-                        wirehtml.append('    </tr></table>')
-                        wirehtml.append('   </td></tr>')
-
-            if cable.shield:
-                wirehtml.append('   <tr><td>&nbsp;</td></tr>')  # spacer
-                wirehtml.append('   <tr>')
-                wirehtml.append('    <td><!-- s_in --></td>')
-                wirehtml.append('    <td>Shield</td>')
-                wirehtml.append('    <td><!-- s_out --></td>')
-                wirehtml.append('   </tr>')
+        if get_profile() is not None:
+            count('nodes', len(self.connectors) + len(self.cables))
+            count('edges', sum(len(connector.loops)
+                               for connector in self.connectors.values()))
+            count('edges', sum((connection.from_port is not None)
+                               + (connection.to_port is not None)
+                               for cable in self.cables.values()
+                               for connection in cable.connections))
+            count('label_bytes', sum(len(line) for line in dot.body
+                                     if ' [label=<' in line))
+            count('fragments_built', built)
+        return dot
+
+    @staticmethod
+    def _cable_ends(cable: Cable) -> List[str]:
+        # Names of the connectors connected to a cable, in order of appearance
+        names = {}
+        for connection in cable.connections:
+            if connection.from_port is not None:
+                names[connection.from_name] = None
+            if connection.to_port is not None:
+                names[connection.to_name] = None
+        return list(names)
+
+    @staticmethod
+    def _add_fragment(dot: 'Graph', fragments: FragmentCache, key: str,
+                      add_node, *args) -> bool:
+        # Append the statements add_node() would append to dot.body, reusing
+        # the ones stored under key, if any; return whether they were built
+        fragment = fragments.get(key)
+        if fragment is not None:
+            dot.body.extend(fragment)
+            return False
+        start = len(dot.body)
+        add_node(dot, *args)
+        fragments.put(key, dot.body[start:])
+        return True
+
+    def _add_connector_node(self, dot: 'Graph', connector: Connector) -> None:
+        html = []
+
+        pintable = None
+        if connector.style != 'simple':
+            pinhtml = []
+            pinhtml.append('<table border="0" cellspacing="0" '
+                           'cellpadding="3" cellborder="1">')
+
+            for pin, pinlabel in zip(connector.pins, connector.pinlabels):
+                if (connector.hide_disconnected_pins and
+                        not connector.visible_pins.get(pin, False)):
+                    continue
+                pinhtml.append('   <tr>')
+                if connector.ports_left:
+                    pinhtml.append(f'    <td port="p{pin}l">{pin}</td>')
+                if pinlabel:
+                    pinhtml.append(f'    <td>{pinlabel}</td>')
+                if connector.ports_right:
+                    pinhtml.append(f'    <td port="p{pin}r">{pin}</td>')
+                pinhtml.append('   </tr>')
+
+            pinhtml.append('  </table>')
+            pintable = '\n'.join(pinhtml)
+
+        rows = [[connector.name if connector.show_name else None],
+                [f'P/N: {connector.pn}' if connector.pn else None,
+                 html_line_breaks(manufacturer_info_field(connector.manufacturer,  # noqa
+                                                          connector.mpn))],
+                [html_line_breaks(connector.type),
+                 html_line_breaks(connector.subtype),
+                 f'{connector.pincount}-pin' if connector.show_pincount
+                    else None,
+                 connector.color, html_colorbar(connector.color)],
+                pintable,
+                [html_image(connector.image)],
+                [html_caption(connector.image)],
+                [html_line_breaks(connector.notes)]]
+        html.extend(nested_html_table(rows))
+
+        html = '\n'.join(html)
+        dot.node(connector.name,
+                 label=f'<\n{html}\n>',
+                 shape='none',
+                 margin='0',
+                 style='filled',
+                 fillcolor='white')
+
+        if len(connector.loops) > 0:
+            dot.attr('edge', color='#000000:#ffffff:#000000')
+            if connector.ports_left:
+                loop_side = 'l'
+                loop_dir = 'w'
+            elif connector.ports_right:
+                loop_side = 'r'
+                loop_dir = 'e'
+            else:
+                raise Exception('No side for loops')
+            for loop in connector.loops:
+                arg1 = f'{connector.name}:p{loop[0]}{loop_side}:{loop_dir}'
+                arg2 = f'{connector.name}:p{loop[1]}{loop_side}:{loop_dir}'
+                dot.edge(arg1, arg2)
+
+    def _add_cable_node(self, dot: 'Graph', cable: Cable, pad: bool) -> None:
+        html = []
+
+        awg_fmt = ''
+        length_fmt = ''
+        if cable.show_equiv:
+            # Only convert units we actually know about, i.e. currently
+            # mm2 and awg --- other units _are_ technically allowed,
+            # and passed through as-is.
+            try:
+                if cable.gauge_unit == 'mm\u00B2':
+                    awg_fmt = f' ({awg_equiv(cable.gauge)} AWG)'
+                elif cable.gauge_unit.upper() == 'AWG':
+                    awg_fmt = f' ({mm2_equiv(cable.gauge)} mm\u00B2)'
+            except AttributeError:
+                # show_equiv works for both wire gauge and length. Ignore
+                # the case when AWG isn't specified
+                pass
+
+            if cable.length_unit == 'in':
+                length_fmt = f' ({in2m(cable.length):.3f} m)'
+            elif cable.length_unit == 'm':
+                length_fmt = f' ({m2in(cable.length):.3f} in)'
+            else:
+                raise Exception(f'Only m or in length units are supported, '
+                                f'not {cable.length_unit}')
+
+        name = cable.name if cable.show_name else None
+
+        cable_pn = None
+        if cable.pn and not isinstance(cable.pn, list):
+            cable_pn = f'P/N: {cable.pn}'
+
+        cable_mfg = None
+        if not isinstance(cable.manufacturer, list):
+            cable_mfg = cable.manufacturer
+
+        cable_mpn = None
+        if not isinstance(cable.mpn, list):
+            cable_mpn = cable.mpn
+
+        mfg = manufacturer_info_field(cable_mfg, cable_mpn)
+
+        wirecount = f'{cable.wirecount}x' if cable.show_wirecount else None
+
+        gauge = None
+        if cable.gauge:
+            gauge = f'{cable.gauge} {cable.gauge_unit}{awg_fmt}'
+
+        shield = '+ S' if cable.shield else None
+
+        length = None
+        if cable.length > 0:
+            length = f'{cable.length} {cable.length_unit}{length_fmt}'
+
+        # text shown at both ends of each wire, known before building the
+        # wire table; the first connection of a wire end is shown
+        wire_ends_in = {}
+        wire_ends_out = {}
+        for connection_color in cable.connections:
+            if connection_color.from_port is not None:
+                from_string = ''
+                if self.connectors[connection_color.from_name].show_name:
+                    from_string = (f'{connection_color.from_name}:'
+                                   f'{connection_color.from_port}')
+                wire_ends_in.setdefault(str(connection_color.via_port),
+                                        from_string)
+            if connection_color.to_port is not None:
+                to_string = ''
+                if self.connectors[connection_color.to_name].show_name:
+                    to_string = (f'{connection_color.to_name}:'
+                                 f'{connection_color.to_port}')
+                wire_ends_out.setdefault(str(connection_color.via_port),
+                                         to_string)
+
+        wirehtml = []
+        # conductor table
+        wirehtml.append('<table border="0" cellspacing="0" cellborder="0">')
+        wirehtml.append('   <tr><td>&nbsp;</td></tr>')
+
+        for i, connection_color in enumerate(cable.colors, 1):
+            wirehtml.append('   <tr>')
+            wire_in = wire_ends_in.get(str(i), f'<!-- {i}_in -->')
+            wirehtml.append(f'    <td>{wire_in}</td>')
+            wvcolors = wv_colors.translate_color(connection_color,
+                                                 self.color_mode)
+            wirehtml.append(f'    <td>{wvcolors}</td>')
+            wire_out = wire_ends_out.get(str(i), f'<!-- {i}_out -->')
+            wirehtml.append(f'    <td>{wire_out}</td>')
+            wirehtml.append('   </tr>')
+
+            bgcolors = ['#000000']
+            bgcolors += get_color_hex(connection_color, pad=pad)
+            bgcolors += ['#000000']
+            wirehtml.append('   <tr>')
+            wirehtml.append('    <td colspan="3" border="0" '
+                            f'cellspacing="0" cellpadding="0" port="w{i}" '
+                            f'height="{(2 * len(bgcolors))}">')
+            wirehtml.append('     <table cellspacing="0" cellborder="0" '
+                            'border="0">')
+            # Reverse to match the curved wires when more than 2 colors
+            for j, bgcolor in enumerate(bgcolors[::-1]):
+                color = bgcolor if bgcolor != "" else \
+                    wv_colors.default_color
+                wirehtml.append('      <tr><td colspan="3" cellpadding="0" '
+                                f'height="2" bgcolor="{color}" border="0">'
+                                '</td></tr>')
+            wirehtml.append('     </table>')
+            wirehtml.append('    </td>')
+            wirehtml.append('   </tr>')
+            # for bundles individual wires can have part information
+            if(cable.category == 'bundle'):
+                # create a list of wire parameters
+                wireidentification = []
+                if isinstance(cable.pn, list):
+                    wireidentification.append(f'P/N: {cable.pn[i - 1]}')
+                wire_mfg = None
+                if isinstance(cable.manufacturer, list):
+                    wire_mfg = cable.manufacturer[i - 1]
+                wire_mpn = None
+                if isinstance(cable.mpn, list):
+                    wire_mpn = cable.mpn[i - 1]
+                mfg_info = manufacturer_info_field(wire_mfg, wire_mpn)
+                if mfg_info:
+                    wireidentification.append(html_line_breaks(mfg_info))
+                # print parameters into a table row under the wire
+                if(len(wireidentification) > 0):
+                    wirehtml.append('   <tr><td colspan="3">')
+                    wirehtml.append('    <table border="0" cellspacing="0" '
+                                    'cellborder="0"><tr>')
+                    for attrib in wireidentification:
+                        wirehtml.append(f'     <td>{attrib}</td>')
+                    wirehtml.append('    </tr></table>')
+                    wirehtml.append('   </td></tr>')
+
+        if cable.shield:
+            wirehtml.append('   <tr><td>&nbsp;</td></tr>')  # spacer
+            wirehtml.append('   <tr>')
+            wire_in = wire_ends_in.get('s', '<!-- s_in -->')
+            wirehtml.append(f'    <td>{wire_in}</td>')
+            wirehtml.append('    <td>Shield</td>')
+            wire_out = wire_ends_out.get('s', '<!-- s_out -->')
+            wirehtml.append(f'    <td>{wire_out}</td>')
+            wirehtml.append('   </tr>')
+            if isinstance(cable.shield, str):
+                # shield is shown with specified color and black borders
+                shield_color_hex = wv_colors.get_color_hex(cable.shield)[0]
+                attributes = (f'height="6" bgcolor="{shield_color_hex}" '
+                              f'border="2" sides="tb"')
+            else:
+                # shield is shown as a thin black wire
+                attributes = f'height="2" bgcolor="#000000" border="0"'
+            wirehtml.append(f'   <tr><td colspan="3" cellpadding="0" '
+                            f'{attributes} port="ws"></td></tr>')
+
+        wirehtml.append('   <tr><td>&nbsp;</td></tr>')
+        wirehtml.append('  </table>')
+
+        rows = [[name],
+                [cable_pn,
+                 html_line_breaks(mfg)],
+                [html_line_breaks(cable.type),
+                 wirecount,
+                 gauge,
+                 shield,
+                 length,
+                 cable.color,
+                 html_colorbar(cable.color)],
+                '\n'.join(wirehtml),
+                [html_image(cable.image)],
+                [html_caption(cable.image)],
+                [html_line_breaks(cable.notes)]]
+        html.extend(nested_html_table(rows))
+
+        # connections
+        for connection_color in cable.connections:
+            # check if it's an actual wire and not a shield
+            if isinstance(connection_color.via_port, int):
+                colors = ['#000000']
+                colors += wv_colors.get_color_hex(
+                    cable.colors[connection_color.via_port - 1], pad=pad)
+                colors += ['#000000']
+                dot.attr('edge', color=':'.join(colors))
+            else:  # it's a shield connection
+                # shield is shown with specified color and black borders,
+                # or as a thin black wire otherwise
+                color = '#000000'
                 if isinstance(cable.shield, str):
-                    # shield is shown with specified color and black borders
-                    shield_color_hex = wv_colors.get_color_hex(cable.shield)[0]
-                    attributes = (f'height="6" bgcolor="{shield_color_hex}" '
-                                  f'border="2" sides="tb"')
-                else:
-                    # shield is shown as a thin black wire
-                    attributes = f'height="2" bgcolor="#000000" border="0"'
-                wirehtml.append(f'   <tr><td colspan="3" cellpadding="0" '
-                                f'{attributes} port="ws"></td></tr>')
+                    colors = ['#000000', shield_color_hex, '#000000']
+                    color = ':'.join(colors)
+                dot.attr('edge', color=color)
+            if connection_color.from_port is not None:  # connect to left
+                from_port = ''
+                if self.connectors[connection_color.from_name].style != 'simple':  # noqa
+                    from_port = f':p{connection_color.from_port}r'
+                code_left_1 = f'{connection_color.from_name}{from_port}:e'
+                code_left_2 = f'{cable.name}:w{connection_color.via_port}:w'
+                dot.edge(code_left_1, code_left_2)
+            if connection_color.to_port is not None:  # connect to right
+                code_right_1 = (f'{cable.name}:w'
+                                f'{connection_color.via_port}:e')
+                to_port = ''
+                if self.connectors[connection_color.to_name].style != 'simple':  # noqa
+                    to_port = f':p{connection_color.to_port}l'
+                code_right_2 = f'{connection_color.to_name}{to_port}:w'
+                dot.edge(code_right_1, code_right_2)
 
-            wirehtml.append('   <tr><td>&nbsp;</td></tr>')
-            wirehtml.append('  </table>')
+        html = '\n'.join(html)
+        style = 'filled,dashed' if cable.category == 'bundle' else ''
+        dot.node(cable.name,
+                 label=f'<\n{html}\n>',
+                 shape='box',
+                 style=style,
+                 margin='0',
+                 fillcolor='white')
 
-            html = [row.replace('<!-- wire table -->',
-                                '\n'.join(wirehtml)) for row in html]
+    def _render_dir(self, directory: (str, Path) = None) -> (str, None):
+        # The directory Graphviz runs in matters only when the graph has
+        # relative image paths, which are resolved against it; return it
+        # then, else None, as the images are the same in every directory.
+        graph = self.create_graph()
+        if self._relative_images is None:
+            self._relative_images = any(
+                not os.path.isabs(src)
+                for src in RenderCache.IMG_SRC.findall(graph.source))
+        if self._relative_images:
+            return os.path.abspath(directory or '.')
+        return None
 
-            # connections
-            for connection_color in cable.connections:
-                # check if it's an actual wire and not a shield
-                if isinstance(connection_color.via_port, int):
-                    colors = ['#000000']
-                    colors += wv_colors.get_color_hex(
-                        cable.colors[connection_color.via_port - 1], pad=pad)
-                    colors += ['#000000']
-                    dot.attr('edge', color=':'.join(colors))
-                else:  # it's a shield connection
-                    # shield is shown with specified color and black borders,
-                    # or as a thin black wire otherwise
-                    color = '#000000'
-                    if isinstance(cable.shield, str):
-                        colors = ['#000000', shield_color_hex, '#000000']
-                        color = ':'.join(colors)
-                    dot.attr('edge', color=color)
-                if connection_color.from_port is not None:  # connect to left
-                    from_port = ''
-                    if self.connectors[connection_color.from_name].style != 'simple':  # noqa
-                        from_port = f':p{connection_color.from_port}r'
-                    code_left_1 = f'{connection_color.from_name}{from_port}:e'
-                    code_left_2 = f'{cable.name}:w{connection_color.via_port}:w'
-                    dot.edge(code_left_1, code_left_2)
-                    from_string = ''
-                    if self.connectors[connection_color.from_name].show_name:
-                        from_string = (f'{connection_color.from_name}:'
-                                       f'{connection_color.from_port}')
-                    repl = f'<!-- {connection_color.via_port}_in -->'
-                    html = [row.replace(repl, from_string) for row in html]
-                if connection_color.to_port is not None:  # connect to right
-                    code_right_1 = (f'{cable.name}:w'
-                                    f'{connection_color.via_port}:e')
-                    to_port = ''
-                    if self.connectors[connection_color.to_name].style != 'simple':  # noqa
-                        to_port = f':p{connection_color.to_port}l'
-                    code_right_2 = f'{connection_color.to_name}{to_port}:w'
-                    dot.edge(code_right_1, code_right_2)
-                    to_string = ''
-                    if self.connectors[connection_color.to_name].show_name:
-                        to_string = (f'{connection_color.to_name}:'
-                                     f'{connection_color.to_port}')
-                    repl = f'<!-- {connection_color.via_port}_out -->'
-                    html = [row.replace(repl, to_string) for row in html]
-
-            html = '\n'.join(html)
-            style = 'filled,dashed' if cable.category == 'bundle' else ''
-            dot.node(cable.name,
-                     label=f'<\n{html}\n>',
-                     shape='box',
-                     style=style,
-                     margin='0',
-                     fillcolor='white')
+    def _cached_render(self, fmt: str,
+                       directory: (str, Path) = None) -> (bytes, None):
+        # Return an image from this instance or the persistent cache, if any.
+        # directory is the one Graphviz runs in, None for the current one.
+        key = (fmt, self._render_dir(directory))
+        if key not in self._rendered:
+            cache = self.render_cache or get_render_cache()
+            if cache is None:
+                return None
+            graph = self.create_graph()
+            data = cache.get(cache.key(graph.source, fmt, graph.engine,
+                                       directory=directory))
+            if data is None:
+                return None
+            self._rendered[key] = data
+        return self._rendered[key]
 
-        return dot
+    def _store_render(self, fmt: str, data: bytes,
+                      directory: (str, Path) = None) -> None:
+        self._rendered[fmt, self._render_dir(directory)] = data
+        cache = self.render_cache or get_render_cache()
+        if cache is not None:
+            graph = self.create_graph()
+            cache.put(cache.key(graph.source, fmt, graph.engine,
+                                directory=directory), data)
+
+    def pipe(self, fmt: str) -> bytes:
+        """Return the diagram rendered in the given format.
+
+        Relative image paths are resolved against the current directory.
+        """
+        return self.pipe_formats((fmt, ))[fmt]
+
+    def pipe_formats(self,
+                     formats: Sequence[str],
+                     directory: (str, Path) = None) -> dict:
+        """Return {format: data} of the diagram, laid out only once.
+
+        Relative image paths are resolved against directory, by default the
+        current one.
+        """
+        rendered = {}
+        missing = []
+        for f in formats:
+            data = self._cached_render(f, directory)
+            if data is None:
+                missing.append(f)
+            else:
+                rendered[f] = data
+        if missing:
+            graph = self.create_graph()
+            new = pipe_formats(graph.source, missing, engine=graph.engine,
+                               encoding=graph.encoding, cwd=directory)
+            for f, data in new.items():
+                self._store_render(f, data, directory)
+            rendered.update(new)
+        return {f: rendered[f] for f in formats}
+
+    @staticmethod
+    def render_many(harnesses: Sequence['Harness'],
+                    formats: Sequence[str] = ('svg', ),
+                    batch_size: int = 100,
+                    directories: Sequence[Any] = None) -> List[Any]:
+        """Render the diagrams of many harnesses with few Graphviz processes.
+
+        Each graph is laid out once for all formats, and graphs are batched
+        per directory that relative image paths are resolved against;
+        directories gives it per harness, by default the current one. The
+        images are kept like those rendered by pipe(), or by output() for
+        the same directory, so that these do not run Graphviz again.
+
+        Returns:
+            per harness, the error raised building or rendering its graph,
+            or None
+        """
+        if directories is None:
+            directories = [None] * len(harnesses)
+        errors = [None] * len(harnesses)
+        # (engine, encoding, cwd, formats) -> [(index, source, directory)]
+        pending = {}
+        for i, (harness, directory) in enumerate(zip(harnesses,
+                                                     directories)):
+            try:
+                missing = tuple(f for f in formats
+                                if harness._cached_render(f, directory)
+                                is None)
+                if missing:
+                    graph = harness.create_graph()
+                    pending.setdefault((graph.engine, graph.encoding,
+                                        harness._render_dir(directory),
+                                        missing), []).append(
+                                            (i, graph.source, directory))
+            except Exception as error:
+                errors[i] = error
+        for (engine, encoding, cwd, missing), items in pending.items():
+            # graphs without relative image paths share one process
+            rendered = pipe_many([source for _, source, _ in items], missing,
+                                 engine, encoding, batch_size, cwd)
+            for (i, _, directory), images in zip(items, rendered):
+                if isinstance(images, Exception):
+                    errors[i] = images
+                    continue
+                for f, data in images.items():
+                    harnesses[i]._store_render(f, data, directory)
+        return errors
+
+    async def render_async(self,
+                           formats: Sequence[str] = ('svg', ),
+                           directory: (str, Path) = None) -> dict:
+        """Return {format: data} of the diagram, awaiting Graphviz.
+
+        The graph itself is built in the calling thread; Graphviz runs as an
+        asyncio subprocess, laying out the graph once for all formats. See
+        wv_async for the limit on concurrent Graphviz processes. Relative
+        image paths are resolved against directory, by default the current
+        one; output() reuses images rendered for the directory of its
+        filename.
+        """
+        from wireviz.wv_async import render_async
+        rendered = {}
+        missing = []
+        for f in formats:
+            data = self._cached_render(f, directory)
+            if data is None:
+                missing.append(f)
+            else:
+                rendered[f] = data
+        if missing:
+            graph = self.create_graph()
+            new = await render_async(graph.source, missing,
+                                     engine=graph.engine,
+                                     encoding=graph.encoding,
+                                     cwd=directory)
+            for f, data in new.items():
+                self._store_render(f, data, directory)
+            rendered.update(new)
+        return {f: rendered[f] for f in formats}
+
+    async def pipe_async(self, fmt: str) -> bytes:
+        """Return the diagram rendered in the given format, see pipe()."""
+        return (await self.render_async((fmt, )))[fmt]
 
     @property
     def png(self):
-        from io import BytesIO
-        graph = self.create_graph()
-        data = BytesIO()
-        data.write(graph.pipe(format='png'))
-        data.seek(0)
-        return data.read()
+        return self.pipe('png')
 
     @property
     def svg(self):
-        from io import BytesIO
-        graph = self.create_graph()
-        data = BytesIO()
-        data.write(graph.pipe(format='svg'))
-        data.seek(0)
-        return data.read()
+        return self.pipe('svg')
 
     def output(self,
                filename: (str, Path),
                view: bool = False,
                cleanup: bool = True,
-               fmt: tuple = ('pdf', )) -> None:
-        # graphical output
+               fmt: tuple = ('pdf', ),
+               bom_fmt: tuple = ('tsv', )) -> None:
+        # graphical output, all formats from a single layout pass; cleanup is
+        # kept for compatibility since no intermediate files are written
         graph = self.create_graph()
-        for f in fmt:
-            graph.format = f
-            graph.render(filename=filename, view=view, cleanup=cleanup)
         graph.save(filename=f'{filename}.gv')
+        # Graphviz runs in the output directory, see render()
+        directory = Path(filename).parent
+        images = {}
+        missing = []
+        for f in fmt:
+            images[f] = self._cached_render(f, directory)
+            if images[f] is None:
+                missing.append(f)
+            else:
+                with open(f'{filename}.{f}', 'wb') as file:
+                    file.write(images[f])
+        with stage('render'):
+            render(graph.source, filename, missing,
+                   engine=graph.engine, encoding=graph.encoding)
+        count('formats_cached', len(fmt) - len(missing))
+        for f in missing:
+            with open(f'{filename}.{f}', 'rb') as file:
+                images[f] = file.read()
+            self._store_render(f, images[f], directory)
+        if view:
+            from graphviz import view as graphviz_view
+            for f in fmt:
+                graphviz_view(f'{filename}.{f}')
         # bom output
-        bom_list = self.bom_list()
-        with open_file_write(f'{filename}.bom.tsv') as file:
-            file.write(tuplelist2tsv(bom_list))
+        with stage('bom_files'):
+            for f in bom_fmt:
+                self.write_bom(f'{filename}.bom.{f}', f)
         # HTML output
+        with stage('html'):
+            self.write_html(filename, images.get('svg'))
+
+    def write_html(self, filename: (str, Path), svg: bytes = None) -> None:
+        """Write filename.html with the diagram and the BOM.
+
+        The diagram is the given SVG data, else the SVG rendered by this
+        harness for the directory of filename, else the contents of
+        filename.svg. The page is assembled in memory and written at once.
+        """
+        if svg is None:
+            svg = self._cached_render('svg', Path(filename).parent)
+        if svg is None:
+            with open(f'{filename}.svg', 'rb') as file:
+                svg = file.read()
+        svg = svg.decode('UTF-8')
+        if '\r' in svg:
+            svg = svg.replace('\r\n', '\n')
+        html = [
+            '<!DOCTYPE html>\n',
+            '<html lang="en"><head>\n',
+            ' <meta charset="UTF-8">\n',
+            f' <meta name="generator" '
+            f'content="{APP_NAME} {__version__} - {APP_URL}">\n',
+            f' <title>{APP_NAME} Diagram and BOM</title>\n',
+            '</head><body style="font-family:Arial">\n',
+            '<h1>Diagram</h1>',
+            re.sub('^<[?]xml [^?>]*[?]>[^<]*<!DOCTYPE [^>]*>',
+                   '<!-- XML and DOCTYPE declarations '
+                   'from SVG file removed -->',
+                   svg[:1024], 1),
+            svg[1024:],
+            '<h1>Bill of Materials</h1>',
+        ]
+        html.extend(html_bom_table(flatten2d(self.bom_list())))
+        html.append('</body></html>')
         with open_file_write(f'{filename}.html') as file:
-            file.write('<!DOCTYPE html>\n')
-            file.write('<html lang="en"><head>\n')
-            file.write(' <meta charset="UTF-8">\n')
-            file.write(f' <meta name="generator" '
-                       f'content="{APP_NAME} {__version__} - {APP_URL}">\n')
-            file.write(f' <title>{APP_NAME} Diagram and BOM</title>\n')
-            file.write('</head><body style="font-family:Arial">\n')
-
-            file.write('<h1>Diagram</h1>')
-            with open_file_read(f'{filename}.svg') as svg:
-                file.write(re.sub(
-                    '^<[?]xml [^?>]*[?]>[^<]*<!DOCTYPE [^>]*>',
-                    '<!-- XML and DOCTYPE declarations '
-                    'from SVG file removed -->',
-                    svg.read(1024), 1))
-                for svgdata in svg:
-                    file.write(svgdata)
-
-            file.write('<h1>Bill of Materials</h1>')
-            listy = flatten2d(bom_list)
-            file.write('<table style="border:1px solid #000000; '
-                       'font-size: 14pt; border-spacing: 0px">')
-            file.write('<tr>')
-            for item in listy[0]:
-                file.write('<th style="text-align:left; '
-                           'border:1px solid #000000; padding: 8px">'
-                           f'{item}</th>')
-            file.write('</tr>')
-            for row in listy[1:]:
-                file.write('<tr>')
-                for i, item in enumerate(row):
-                    item_str = item.replace('\u00b2', '&sup2;')
-                    align = 'text-align:right; ' if listy[0][i] == 'Qty' else ''
-                    file.write(f'<td style="{align}border:1px solid #000000; '
-                               f'padding: 4px">{item_str}</td>')
-                file.write('</tr>')
-            file.write('</table>')
-
-            file.write('</body></html>')
+            file.write(''.join(html))
+
+    def write_bom(self, filename: (str, Path), fmt: str = 'tsv') -> None:
+        """Stream the BOM to a tsv, csv or jsonl (JSON Lines) file."""
+        if fmt == 'tsv':
+            with open_file_write(filename) as file:
+                write_tsv(file, self.bom_rows())
+        elif fmt == 'csv':
+            with open_file_write(filename, newline='') as file:
+                write_csv(file, self.bom_rows())
+        elif fmt == 'jsonl':
+            with open_file_write(filename) as file:
+                write_jsonl(file, self.bom())
+        else:
+            raise Exception(f'Unknown BOM format {fmt}')
 
     def bom(self):
+        self._check_cache()
+        if self._bom is None:
+            with stage('bom'):
+                self._bom = self._bom_items()
+        return self._bom
+
+    def _bom_items(self):
         bom = []
         bom_connectors = []
         bom_cables = []
@@ -494,12 +847,12 @@ class Harness:
                     c.manufacturer,
                     c.mpn,
                     c.pn)
-        for group in Counter([connector_group(v)
-                              for v in self.connectors.values()]):
-            items = {k: v for k, v in self.connectors.items()
-                     if connector_group(v) == group}
-            shared = next(iter(items.values()))
-            designators = list(items.keys())
+        connector_groups = {}
+        for designator, connector in self.connectors.items():
+            connector_groups.setdefault(connector_group(connector),
+                                        []).append(designator)
+        for designators in connector_groups.values():
+            shared = self.connectors[designators[0]]
             designators.sort()
             conn_type = ''
             if shared.type:
@@ -523,8 +876,8 @@ class Harness:
                     'mpn': remove_line_breaks(shared.mpn),
                     'pn': shared.pn}
             bom_connectors.append(item)
-            # https://stackoverflow.com/a/73050
-            bom_connectors = sorted(bom_connectors, key=lambda k: k['item'])
+        # https://stackoverflow.com/a/73050
+        bom_connectors.sort(key=lambda k: k['item'])
         bom.extend(bom_connectors)
 
         # cables
@@ -541,17 +894,37 @@ class Harness:
                     c.manufacturer,
                     c.mpn,
                     c.pn)
-        for group in Counter([cable_group(v) for v in self.cables.values()
-                              if v.category != 'bundle']):
-            items = {k: v for k, v in self.cables.items()
-                     if cable_group(v) == group}
-            shared = next(iter(items.values()))
-            designators = list(items.keys())
+        cable_groups = {}
+        # bundles (ignores wirecount); bundles are represented as cables
+        # internally, with the category='bundle' set, and each of their wires
+        # is grouped with similar wires from all the bundles
+        wire_groups = {}
+        for designator, cable in self.cables.items():
+            if cable.category != 'bundle':
+                cable_groups.setdefault(cable_group(cable),
+                                        []).append(designator)
+                continue
+            for index, color in enumerate(cable.colors):
+                mfg = remove_line_breaks(index_if_list(cable.manufacturer,
+                                                       index))
+                mpn = remove_line_breaks(index_if_list(cable.mpn, index))
+                group = (cable.type,
+                         cable.gauge,
+                         cable.gauge_unit,
+                         color,
+                         mfg,
+                         mpn,
+                         index_if_list(cable.pn, index))
+                wire_groups.setdefault(group, []).append(cable)
+
+        lnorm = m2in if self.length_unit == 'in' else in2m
+        for designators in cable_groups.values():
+            items = [self.cables[designator] for designator in designators]
+            shared = items[0]
             designators.sort()
 
-            lnorm = m2in if self.length_unit == 'in' else in2m
             lengths = []
-            for i in items.values():
+            for i in items:
                 if i.length_unit != self.length_unit:
                     lengths.append(lnorm(i.length))
                 else:
@@ -577,65 +950,36 @@ class Harness:
                     'mpn': remove_line_breaks(shared.mpn),
                     'pn': shared.pn}
             bom_cables.append(item)
-        # bundles (ignores wirecount)
-        wirelist = []
-        # list all cables again, since bundles are represented as wires
-        # internally, with the category='bundle' set
-        for bundle in self.cables.values():
-            if bundle.category == 'bundle':
-                # add each wire from each bundle to the wirelist
-                for index, color in enumerate(bundle.colors, 0):
-                    mfg = remove_line_breaks(index_if_list(bundle.manufacturer,
-                                                           index))
-                    mpn = remove_line_breaks(index_if_list(bundle.mpn, index))
-                    wirelist.append({'type': bundle.type,
-                                     'gauge': bundle.gauge,
-                                     'gauge_unit': bundle.gauge_unit,
-                                     'length': bundle.length,
-                                     'length_unit': bundle.length_unit,
-                                     'color': color,
-                                     'designator': bundle.name,
-                                     'manufacturer': mfg,
-                                     'mpn': mpn,
-                                     'pn': index_if_list(bundle.pn, index)})
 
         # join similar wires from all the bundles to a single BOM item
-        def wire_group(w):
-            return (w.get('type', None),
-                    w['gauge'],
-                    w['gauge_unit'],
-                    w['color'],
-                    w['manufacturer'],
-                    w['mpn'],
-                    w['pn'])
-        for group in Counter([wire_group(v) for v in wirelist]):
-            items = [v for v in wirelist if wire_group(v) == group]
-            shared = items[0]
-            designators = [i['designator'] for i in items]
-            designators = list(dict.fromkeys(designators))  # remove duplicates
+        for group, bundles in wire_groups.items():
+            wire_type, gauge, gauge_unit, color, mfg, mpn, pn = group
+            # remove duplicates
+            designators = list(dict.fromkeys(i.name for i in bundles))
             designators.sort()
-            total_length = sum(i['length'] for i in items)
-            wire_type = ''
-            if shared.get('type', None):
-                wire_type = f', {remove_line_breaks(shared["type"])}'
+            total_length = sum(i.length for i in bundles)
+            if wire_type:
+                wire_type = f', {remove_line_breaks(wire_type)}'
+            else:
+                wire_type = ''
             gauge_name = ''
-            if shared.get('gauge', None):
-                gauge_name = f', {shared["gauge"]} {shared["gauge_unit"]}'
-            gauge_color = ''
-            if 'color' in shared != '':
-                gauge_color = f', {shared["color"]}'
+            if gauge:
+                gauge_name = f', {gauge} {gauge_unit}'
+            gauge_color = f', {color}'
             name = f'Wire{wire_type}{gauge_name}{gauge_color}'
             item = {'item': name,
                     'qty': round(total_length, 3),
                     'unit': self.length_unit,
                     'designators': designators,
-                    'manufacturer': shared['manufacturer'],
-                    'mpn': shared['mpn'],
-                    'pn': shared['pn']}
+                    'manufacturer': mfg,
+                    'mpn': mpn,
+                    'pn': pn}
             bom_cables.append(item)
+        if wire_groups:
             # sort list of dicts by their values
-            # (https://stackoverflow.com/a/73050)
-            bom_cables = sorted(bom_cables, key=lambda k: k['item'])
+            # (https://stackoverflow.com/a/73050); cables are only sorted
+            # together with bundle wires, as in the past
+            bom_cables.sort(key=lambda k: k['item'])
         bom.extend(bom_cables)
 
         for item in self.additional_bom_items:
@@ -656,6 +1000,10 @@ class Harness:
         return bom
 
     def bom_list(self):
+        return list(self.bom_rows())
+
+    def bom_rows(self):
+        """Yield the BOM header row, then one row per BOM item."""
         bom = self.bom()
         # these BOM columns will always be included
         keys = ['item', 'qty', 'unit', 'designators']
@@ -664,16 +1012,15 @@ class Harness:
         for fieldname in ['pn', 'manufacturer', 'mpn']:
             if any(fieldname in x and x.get(fieldname, None) for x in bom):
                 keys.append(fieldname)
-        bom_list = []
         # list of staic bom header names, headers not specified here are
         # generated by capitilising the internal name
         bom_headings = {
             "pn": "P/N",
             "mpn": "MPN"
         }
-        bom_list.append([(bom_headings[k] if k in bom_headings
-                          else k.capitalize())
-                         for k in keys])  # create header row with keys
+        yield [(bom_headings[k] if k in bom_headings
+                else k.capitalize())
+               for k in keys]  # create header row with keys
         for item in bom:
             # fill missing values with blanks
             item_list = [item.get(key, '') for key in keys]
@@ -684,5 +1031,4 @@ class Harness:
             # if a field is missing for some (but not all) BOM items
             item_list = ['' if subitem is None else subitem
                          for subitem in item_list]
-            bom_list.append(item_list)
-        return bom_list
+            yield item_list
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
 
 if __name__ == "__main__":
-    from .wireviz import main
+    from .wv_cli import main
     main(prog_name="wireviz")
@@ -1,28 +1,30 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
 import os
 from pathlib import Path
-from typing import Any, Optional, Tuple
-import re
+from typing import Any, List, Tuple
 
-import yaml
-import click
-
-from . import __version__
+from .DataClasses import Connector
 from .Harness import Harness
-from .wv_helper import expand, open_file_read, convert_to_pathlib
+from .wv_helper import (expand, open_file_read, open_file_write,
+                        save_image_sizes)
+from .wv_library import Library, load_library, load_yaml
+from .wv_profile import profiling, stage
 
 COMMON_LIB = (Path(__file__).parent / 'common' / 'lib.yaml').resolve()
 
 
-def parse(yaml_input: str,
+def parse(yaml_input: (str, dict),
           file_out: (str, Path) = None,
-          return_types: (None, str, Tuple[str]) = None) -> Any:
+          return_types: (None, str, Tuple[str]) = None,
+          bom_fmt: Tuple[str, ...] = ('tsv', )) -> Any:
     """
     Parses yaml input string and does the high-level harness conversion
 
-    :param yaml_input: a string containing the yaml input data
+    :param yaml_input: a string containing the yaml input data, or the data
+        already loaded from it
     :param file_out:
     :param return_types: if None, then returns None; if the value is a string,
         then a corresponding data format will be returned; if the value is a
@@ -32,12 +34,104 @@ def parse(yaml_input: str,
             - "png" - will return the PNG data
             - "svg" - will return the SVG data
             - "harness" - will return the `Harness` instance
+    :param bom_fmt: BOM files written next to file_out; any of "tsv", "csv"
+        and "jsonl"
+    """
+
+    if isinstance(yaml_input, str):
+        with stage('yaml_load'):
+            yaml_data = load_yaml(yaml_input)
+    else:
+        yaml_data = yaml_input
+
+    with stage('parse'):
+        harness = _build_harness(yaml_data, file_out)
+
+    if file_out is not None:
+        with stage('output'):
+            harness.output(filename=file_out, fmt=('png', 'svg'), view=False,
+                           bom_fmt=bom_fmt)
+
+    return _parse_returns(harness, return_types)
+
+
+async def parse_async(yaml_input: (str, dict),
+                      file_out: (str, Path) = None,
+                      return_types: (None, str, Tuple[str]) = None,
+                      bom_fmt: Tuple[str, ...] = ('tsv', )) -> Any:
+    """Like parse(), but awaiting Graphviz instead of blocking on it.
+
+    The harness is loaded, built and written in the calling thread; only the
+    Graphviz layout runs concurrently, see Harness.render_async().
     """
+    if isinstance(yaml_input, str):
+        with stage('yaml_load'):
+            yaml_data = load_yaml(yaml_input)
+    else:
+        yaml_data = yaml_input
+
+    with stage('parse'):
+        harness = _build_harness(yaml_data, file_out)
+
+    if isinstance(return_types, str):
+        return_types = [return_types]
+    # output() renders in the output directory and pipe() in the current
+    # one, see Harness.render_async()
+    if file_out is not None:
+        await harness.render_async(('png', 'svg'), Path(file_out).parent)
+    formats = [t.lower() for t in return_types or []
+               if t.lower() in ('png', 'svg')]
+    if formats:
+        await harness.render_async(formats)
+
+    if file_out is not None:
+        with stage('output'):
+            # the images are written from memory, without running Graphviz
+            harness.output(filename=file_out, fmt=('png', 'svg'), view=False,
+                           bom_fmt=bom_fmt)
+
+    return _parse_returns(harness, return_types)
 
-    yaml_data = yaml.safe_load(yaml_input)
 
+def _parse_returns(harness: Harness,
+                   return_types: (None, str, Tuple[str])) -> Any:
+    # The return value of parse() for the given return_types
+    if return_types is not None:
+        returns = []
+        # only one return type speficied
+        if isinstance(return_types, str):
+            return_types = [return_types]
+
+        return_types = [t.lower() for t in return_types]
+        # one Graphviz run for all images, unless output() rendered them
+        images = harness.pipe_formats([rt for rt in return_types
+                                       if rt in ('png', 'svg')])
+
+        for rt in return_types:
+            if rt in ('png', 'svg'):
+                returns.append(images[rt])
+            if rt == 'harness':
+                returns.append(harness)
+
+        return tuple(returns) if len(returns) != 1 else returns[0]
+
+
+def _build_harness(yaml_data: dict,
+                   file_out: (str, Path) = None,
+                   errors: List[str] = None) -> Harness:
+    # Create the harness described by the loaded YAML data. When a list of
+    # errors is given, the error of every connector, cable and connection
+    # set is added to it and building goes on, instead of raising the first.
     harness = Harness()
 
+    def attempt(where, function, *args):
+        if errors is None:
+            return function(*args)
+        try:
+            function(*args)
+        except Exception as error:
+            errors.append(f'{where}: {type(error).__name__}: {error}')
+
     # add items
     sections = ['connectors', 'cables', 'connections']
     types = [dict, dict, list]
@@ -46,18 +140,8 @@ def parse(yaml_input: str,
             if len(yaml_data[sec]) > 0:
                 if ty == dict:
                     for key, attribs in yaml_data[sec].items():
-                        # The Image dataclass might need to open an image file
-                        # with a relative path.
-                        image = attribs.get('image')
-                        if isinstance(image, dict):
-                            image['gv_dir'] = Path(file_out if file_out
-                                                   else '').parent
-
-                        if sec == 'connectors':
-                            if not attribs.get('autogenerate', False):
-                                harness.add_connector(name=key, **attribs)
-                        elif sec == 'cables':
-                            harness.add_cable(name=key, **attribs)
+                        attempt(f'{sec}.{key}', _add_part, harness, sec, key,
+                                attribs, file_out)
             else:
                 pass  # section exists but is empty
         else:  # section does not exist, create empty section
@@ -67,156 +151,160 @@ def parse(yaml_input: str,
                 yaml_data[sec] = []
 
     # add connections
-    def check_designators(what, where):
-        for i, x in enumerate(what):
-            if x not in yaml_data[where[i]]:
-                return False
-        return True
-
     autogenerated_ids = {}
-    for connection in yaml_data['connections']:
-        # find first component (potentially nested inside list or dict)
-        first_item = connection[0]
-        if isinstance(first_item, list):
-            first_item = first_item[0]
-        elif isinstance(first_item, dict):
-            first_item = list(first_item.keys())[0]
-        elif isinstance(first_item, str):
-            pass
-
-        # check which section the first item belongs to
-        alternating_sections = ['connectors', 'cables']
-        for index, section in enumerate(alternating_sections):
-            if first_item in yaml_data[section]:
-                expected_index = index
-                break
-        else:
-            raise Exception('First item not found anywhere.')
-        # flip once since it is flipped back at the *beginning* of every loop
-        expected_index = 1 - expected_index
-
-        # check that all iterable items (lists and dicts) are the same length
-        # and that they are alternating between connectors and cables/bundles,
-        # starting with either
-        itemcount = None
-        for item in connection:
-            # make sure items alternate between connectors and cables
-            expected_index = 1 - expected_index
-            expected_section = alternating_sections[expected_index]
-            if isinstance(item, list):
-                itemcount_new = len(item)
-                for subitem in item:
-                    if subitem not in yaml_data[expected_section]:
-                        raise Exception(f'{subitem} is not in '
-                                        f'{expected_section}')
-            elif isinstance(item, dict):
-                if len(item.keys()) != 1:
-                    raise Exception('Dicts may contain only one key here!')
-                itemcount_new = len(expand(list(item.values())[0]))
-                subitem = list(item.keys())[0]
-                if subitem not in yaml_data[expected_section]:
-                    raise Exception(f'{subitem} is not in {expected_section}')
-            elif isinstance(item, str):
-                if item not in yaml_data[expected_section]:
-                    raise Exception(f'{item} is not in {expected_section}')
-                continue
-            if itemcount is not None and itemcount_new != itemcount:
-                raise Exception('All lists and dict lists must '
-                                'be the same length!')
-            itemcount = itemcount_new
-        if itemcount is None:
-            raise Exception('No item revealed the number '
-                            'of connections to make!')
-
-        # populate connection list
-        connection_list = []
-        for i, item in enumerate(connection):
-            if isinstance(item, str):  # one single-pin component was specified
-                sublist = []
-                for i in range(1, itemcount + 1):
-                    if yaml_data['connectors'][item].get('autogenerate'):
-                        autogenerated_ids[item] = 1 + \
-                            autogenerated_ids.get(item, 0)
-                        new_id = f'_{item}_{autogenerated_ids[item]}'
-                        harness.add_connector(new_id,
-                                              **yaml_data['connectors'][item])
-                        sublist.append([new_id, 1])
-                    else:
-                        sublist.append([item, 1])
-                connection_list.append(sublist)
-            # a list of single-pin components were specified
-            elif isinstance(item, list):
-                sublist = []
-                for subitem in item:
-                    if yaml_data['connectors'][subitem].get('autogenerate'):
-                        autogenerated_ids[subitem] = 1 + \
-                            autogenerated_ids.get(subitem, 0)
-                        new_id = f'_{subitem}_{autogenerated_ids[subitem]}'
-                        harness.add_connector(new_id,
-                                              **yaml_data['connectors'][subitem])  # noqa
-                        sublist.append([new_id, 1])
-                    else:
-                        sublist.append([subitem, 1])
-                connection_list.append(sublist)
-            # a component with multiple pins was specified
-            elif isinstance(item, dict):
-                sublist = []
-                id = list(item.keys())[0]
-                pins = expand(list(item.values())[0])
-                for pin in pins:
-                    sublist.append([id, pin])
-                connection_list.append(sublist)
-            else:
-                raise Exception('Unexpected item in connection list')
-
-        # actually connect components using connection list
-        for i, item in enumerate(connection_list):
-            id = item[0][0]  # TODO: make more elegant/robust/pythonic
-            if id in harness.cables:
-                for j, con in enumerate(item):
-                    # list started with a cable, no connector to join on
-                    # left side
-                    if i == 0:
-                        from_name, from_pin = None, None
-                    else:
-                        from_name, from_pin = connection_list[i - 1][j][0:2]
-                    via_name, via_pin = item[j][0:2]
-                    # list ends with a cable, no connector to join on right side
-                    if i == len(connection_list) - 1:
-                        to_name, to_pin = None, None
-                    else:
-                        to_name, to_pin = connection_list[i + 1][j][0:2]
-                    harness.connect(from_name,
-                                    from_pin,
-                                    via_name,
-                                    via_pin,
-                                    to_name,
-                                    to_pin)
+    prototypes = {}
+    for i, connection in enumerate(yaml_data['connections']):
+        attempt(f'connections[{i}]', _add_connection_set, harness, yaml_data,
+                connection, autogenerated_ids, prototypes)
 
     if "additional_bom_items" in yaml_data:
         for line in yaml_data["additional_bom_items"]:
             harness.add_bom_item(line)
 
-    if file_out is not None:
-        harness.output(filename=file_out, fmt=('png', 'svg'), view=False)
-
-    if return_types is not None:
-        returns = []
-        # only one return type speficied
-        if isinstance(return_types, str):
-            return_types = [return_types]
-
-        return_types = [t.lower() for t in return_types]
-
-        for rt in return_types:
-            if rt == 'png':
-                returns.append(harness.png)
-            if rt == 'svg':
-                returns.append(harness.svg)
-            if rt == 'harness':
-                returns.append(harness)
-
-        return tuple(returns) if len(returns) != 1 else returns[0]
+    return harness
+
+
+def _add_part(harness: Harness, section: str, name: str, attribs: dict,
+              file_out: (str, Path) = None) -> None:
+    # The Image dataclass might need to open an image file
+    # with a relative path.
+    image = attribs.get('image')
+    if isinstance(image, dict):
+        image['gv_dir'] = Path(file_out if file_out else '').parent
+
+    if section == 'connectors':
+        if not attribs.get('autogenerate', False):
+            harness.add_connector(name=name, **attribs)
+    elif section == 'cables':
+        harness.add_cable(name=name, **attribs)
+
+
+def _add_autogenerated(harness: Harness, yaml_data: dict, name: str,
+                       autogenerated_ids: dict, prototypes: dict) -> str:
+    # Add the next instance of the autogenerated connector name, cloned from
+    # its prototype, which is checked and built once; return its designator
+    if name not in prototypes:
+        prototypes[name] = Connector(name, **yaml_data['connectors'][name])
+    autogenerated_ids[name] = 1 + autogenerated_ids.get(name, 0)
+    new_id = f'_{name}_{autogenerated_ids[name]}'
+    harness.add_connector_clone(new_id, prototypes[name])
+    return new_id
+
+
+def _add_connection_set(harness: Harness, yaml_data: dict, connection: list,
+                        autogenerated_ids: dict, prototypes: dict) -> None:
+    # Check one set of connections and make them
+    # find first component (potentially nested inside list or dict)
+    first_item = connection[0]
+    if isinstance(first_item, list):
+        first_item = first_item[0]
+    elif isinstance(first_item, dict):
+        first_item = list(first_item.keys())[0]
+    elif isinstance(first_item, str):
+        pass
+
+    # check which section the first item belongs to
+    alternating_sections = ['connectors', 'cables']
+    for index, section in enumerate(alternating_sections):
+        if first_item in yaml_data[section]:
+            expected_index = index
+            break
+    else:
+        raise Exception('First item not found anywhere.')
+    # flip once since it is flipped back at the *beginning* of every loop
+    expected_index = 1 - expected_index
+
+    # check that all iterable items (lists and dicts) are the same length
+    # and that they are alternating between connectors and cables/bundles,
+    # starting with either
+    itemcount = None
+    for item in connection:
+        # make sure items alternate between connectors and cables
+        expected_index = 1 - expected_index
+        expected_section = alternating_sections[expected_index]
+        if isinstance(item, list):
+            itemcount_new = len(item)
+            for subitem in item:
+                if subitem not in yaml_data[expected_section]:
+                    raise Exception(f'{subitem} is not in '
+                                    f'{expected_section}')
+        elif isinstance(item, dict):
+            if len(item.keys()) != 1:
+                raise Exception('Dicts may contain only one key here!')
+            itemcount_new = len(expand(list(item.values())[0]))
+            subitem = list(item.keys())[0]
+            if subitem not in yaml_data[expected_section]:
+                raise Exception(f'{subitem} is not in {expected_section}')
+        elif isinstance(item, str):
+            if item not in yaml_data[expected_section]:
+                raise Exception(f'{item} is not in {expected_section}')
+            continue
+        if itemcount is not None and itemcount_new != itemcount:
+            raise Exception('All lists and dict lists must '
+                            'be the same length!')
+        itemcount = itemcount_new
+    if itemcount is None:
+        raise Exception('No item revealed the number '
+                        'of connections to make!')
+
+    # populate connection list
+    connection_list = []
+    for i, item in enumerate(connection):
+        if isinstance(item, str):  # one single-pin component was specified
+            sublist = []
+            for i in range(1, itemcount + 1):
+                if yaml_data['connectors'][item].get('autogenerate'):
+                    new_id = _add_autogenerated(harness, yaml_data, item,
+                                                autogenerated_ids, prototypes)
+                    sublist.append([new_id, 1])
+                else:
+                    sublist.append([item, 1])
+            connection_list.append(sublist)
+        # a list of single-pin components were specified
+        elif isinstance(item, list):
+            sublist = []
+            for subitem in item:
+                if yaml_data['connectors'][subitem].get('autogenerate'):
+                    new_id = _add_autogenerated(harness, yaml_data, subitem,
+                                                autogenerated_ids, prototypes)
+                    sublist.append([new_id, 1])
+                else:
+                    sublist.append([subitem, 1])
+            connection_list.append(sublist)
+        # a component with multiple pins was specified
+        elif isinstance(item, dict):
+            sublist = []
+            id = list(item.keys())[0]
+            pins = expand(list(item.values())[0])
+            for pin in pins:
+                sublist.append([id, pin])
+            connection_list.append(sublist)
+        else:
+            raise Exception('Unexpected item in connection list')
+
+    # actually connect components using connection list
+    columns = ([], [], [], [], [], [])
+    for i, item in enumerate(connection_list):
+        id = item[0][0]  # TODO: make more elegant/robust/pythonic
+        if id in harness.cables:
+            for j, con in enumerate(item):
+                # list started with a cable, no connector to join on
+                # left side
+                if i == 0:
+                    from_name, from_pin = None, None
+                else:
+                    from_name, from_pin = connection_list[i - 1][j][0:2]
+                via_name, via_pin = item[j][0:2]
+                # list ends with a cable, no connector to join on right side
+                if i == len(connection_list) - 1:
+                    to_name, to_pin = None, None
+                else:
+                    to_name, to_pin = connection_list[i + 1][j][0:2]
+                for column, value in zip(columns, (from_name, from_pin,
+                                                   via_name, via_pin,
+                                                   to_name, to_pin)):
+                    column.append(value)
+    harness.connect_many(*columns)
 
 
 def parse_file(yaml_file: str, file_out: (str, Path) = None) -> None:
@@ -231,108 +319,188 @@ def parse_file(yaml_file: str, file_out: (str, Path) = None) -> None:
     parse(yaml_input, file_out=file_out)
 
 
-@click.command(context_settings={'help_option_names': ['-h', '--help']})
-@click.version_option(__version__, prog_name="wireviz")
-@click.argument('srcfile',
-                type=click.Path(exists=True,
-                                file_okay=True,
-                                dir_okay=False,
-                                writable=False,
-                                readable=True,
-                                resolve_path=True,
-                                allow_dash=False))
-@click.option('--prepend-common-lib', '--common', '-c',
-              is_flag=True,
-              default=False,
-              help=("includes the rrc-wireviz common library located in "
-                    f"{COMMON_LIB!s}"))
-@click.option('--outfile', '-o',
-              type=click.Path(exists=False,
-                              file_okay=True,
-                              dir_okay=False,
-                              writable=True,
-                              readable=False,
-                              resolve_path=True,
-                              allow_dash=True),
-              help=("output file, extension is ignored; "
-                    "defaults to input filename"))
-@click.option('--prepend-file', '--prepend', '-i',  # i for include
-              type=click.Path(exists=True,
-                              file_okay=True,
-                              dir_okay=False,
-                              writable=False,
-                              readable=True,
-                              resolve_path=True,
-                              allow_dash=False),
-              help="file(s) to prepend/include to the srcfile",
-              multiple=True)
-def main(srcfile: Optional[Path],
-         prepend_common_lib: bool,
-         outfile: Optional[Path] = None,
-         prepend_file: Optional[Tuple[Path, ...]] = None) -> None:
-    '''Generate cable and wiring harness documentation from YAML descriptions.
-
-    Documentation can be found on the ISBU Hardware Wiki:
-    http://isbuhome/isbuwiki/index.php/Wireviz
-    '''
-    srcfile = convert_to_pathlib(srcfile)
-
-    if outfile:
-        outfile = convert_to_pathlib(outfile)
-    if prepend_file:
-        prepended_file = ()
-        for i, file in enumerate(prepend_file):
-            prepended_file += (convert_to_pathlib(file),)
-        prepend_file = prepended_file
-
-    wireviz(srcfile, prepend_common_lib, outfile, prepend_file)
-
-
 def wireviz(srcfile: Path,
             use_common_lib: bool,
             outfile: Path = None,
-            prepend_file: Tuple[Path, ...] = None) -> None:
+            prepend_file: Tuple[Path, ...] = None,
+            prepend: Library = None,
+            bom_fmt: Tuple[str, ...] = ('tsv', ),
+            profile: bool = False) -> Harness:
     """Main function used to invoke the wireviz application.
 
     This can be used programatically, but is also called through the CLI.
 
     Args:
-        srcfile: the .yaml file to parse
+        srcfile: the .yaml file to parse, or a .json file with the same
+            structure, which loads faster
         use_common_lib: when True, uses the build-in common library
         outfile: base name of the output file artifacts; defaults to the srcfile
             basename
         prepend_file: list of files to prepend to srcfile
+        prepend: library previously returned by read_prepend(); when given,
+            use_common_lib and prepend_file are ignored
+        bom_fmt: BOM file formats to write; any of "tsv", "csv" and "jsonl"
+        profile: when True, also write the time spent in each stage and other
+            counters to <outfile>.profile.json; see wv_profile
+
+    Returns:
+        the Harness created from srcfile
     """
-    with open_file_read(srcfile) as src:
-        yaml_input = src.read()
-
-    # Prepend the common library
-    prepend = ''
-    if use_common_lib:
-        with open(COMMON_LIB) as src:
-            file = src.read()
-        # Make all the file paths absolute
-        for filepath in re.finditer(r'^\s+src: (.+)$', file, re.MULTILINE):
-            path = (COMMON_LIB.parent / filepath.group(1)).resolve()
-            file = file.replace(filepath.group(1), str(path))
-        prepend += file
-
-    # Prepend other files
-    for filename in (prepend_file or []):
-        with open(filename) as src:
-            file = src.read()
-        # Make all the file paths absolute
-        for filepath in re.finditer(r'^\s+src: (.+)$', file, re.MULTILINE):
-            path = (filename.parent / filepath.group(1)).resolve()
-            file = file.replace(filepath.group(1), str(path))
-        prepend += file
-
-    yaml_input = prepend + yaml_input
-
+    file_out = output_base(srcfile, outfile)
+
+    if profile:
+        with profiling() as run:
+            with stage('wireviz'):
+                harness = wireviz(srcfile, use_common_lib, outfile,
+                                  prepend_file, prepend, bom_fmt)
+        with open_file_write(f'{file_out}.profile.json') as file:
+            json.dump({'srcfile': str(srcfile), **run.as_dict()}, file,
+                      indent=2)
+        return harness
+
+    harness = load_harness(srcfile, file_out, use_common_lib, prepend_file,
+                           prepend)
+    with stage('output'):
+        harness.output(filename=file_out, fmt=('png', 'svg'), view=False,
+                       bom_fmt=bom_fmt)
+    save_image_sizes()
+    return harness
+
+
+def output_base(srcfile: Path, outfile: Path = None) -> str:
+    """Return the base name of the output files of srcfile, see wireviz()."""
     if outfile:
         outfile.parent.mkdir(parents=True, exist_ok=True)
-        file_out = f"{outfile.parents[0] / outfile.stem!s}"
+        return f"{outfile.parents[0] / outfile.stem!s}"
+    return f"{srcfile.parents[0] / srcfile.stem!s}"
+
+
+def load_harness(srcfile: Path,
+                 file_out: str,
+                 use_common_lib: bool,
+                 prepend_file: Tuple[Path, ...] = None,
+                 prepend: Library = None) -> Harness:
+    """Create the Harness described by srcfile without writing any output.
+
+    Args:
+        file_out: base name of the output files, which image paths are
+            relative to; see output_base()
+        srcfile, use_common_lib, prepend_file, prepend: see wireviz()
+    """
+    yaml_data = _load_srcfile(srcfile, use_common_lib, prepend_file, prepend)
+    with stage('parse'):
+        return _build_harness(yaml_data, file_out)
+
+
+def _load_srcfile(srcfile: Path,
+                  use_common_lib: bool,
+                  prepend_file: Tuple[Path, ...] = None,
+                  prepend: Library = None) -> dict:
+    # Return the data of srcfile merged with the prepended libraries
+    with stage('read'):
+        with open_file_read(srcfile) as src:
+            yaml_input = src.read()
+
+    if prepend is None:
+        with stage('library'):
+            prepend = read_prepend(use_common_lib, prepend_file)
+    with stage('yaml_load'):
+        if srcfile.suffix.lower() == '.json':
+            # e.g. written by a generator; libraries still provide sections
+            return prepend.merge(json.loads(yaml_input))
+        return prepend.load(yaml_input)
+
+
+def validate(yaml_input: (str, dict)) -> List[str]:
+    """Check a harness description without rendering it.
+
+    Connectors, cables and connections are checked as by parse(), but no
+    graph is built, no image is read and no file is written. Every
+    connector, cable and connection set is checked, so that all errors are
+    found rather than only the first.
+
+    :param yaml_input: a string containing the yaml input data, or the data
+        already loaded from it
+    :return: the errors found; empty if the description is valid
+    """
+    if isinstance(yaml_input, str):
+        try:
+            yaml_data = load_yaml(yaml_input)
+        except Exception as error:
+            return [f'{type(error).__name__}: {error}']
     else:
-        file_out = f"{srcfile.parents[0] / srcfile.stem!s}"
+        yaml_data = yaml_input
+    if not isinstance(yaml_data, dict):
+        return ['The harness description must be a mapping']
+
+    # images only matter for rendering; leaving them out avoids reading them
+    yaml_data = dict(yaml_data)
+    for sec in ('connectors', 'cables'):
+        if isinstance(yaml_data.get(sec), dict):
+            yaml_data[sec] = {
+                key: ({k: v for k, v in attribs.items() if k != 'image'}
+                      if isinstance(attribs, dict) else attribs)
+                for key, attribs in yaml_data[sec].items()}
+    errors = []
+    try:
+        harness = _build_harness(yaml_data, errors=errors)
+    except Exception as error:  # e.g. invalid additional BOM items
+        errors.append(f'{type(error).__name__}: {error}')
+        return errors
+
+    # loops are otherwise only checked when the graph is built
+    connected = set()
+    for cable in harness.cables.values():
+        for connection in cable.connections:
+            if connection.from_port is not None:
+                connected.add(connection.from_name)
+            if connection.to_port is not None:
+                connected.add(connection.to_name)
+    for name, connector in harness.connectors.items():
+        if connector.loops and name not in connected:
+            errors.append(f'connectors.{name}: Exception: No side for loops')
+        for loop in connector.loops:
+            for pin in loop:
+                if pin not in connector.pin_index:
+                    errors.append(f'connectors.{name}: Exception: '
+                                  f'Loop pin {name}:{pin} not found.')
+    return errors
+
+
+def validate_file(srcfile: Path,
+                  use_common_lib: bool = False,
+                  prepend_file: Tuple[Path, ...] = None,
+                  prepend: Library = None) -> List[str]:
+    """Check srcfile without rendering it, see validate() and wireviz()."""
+    try:
+        yaml_data = _load_srcfile(srcfile, use_common_lib, prepend_file,
+                                  prepend)
+    except Exception as error:
+        return [f'{type(error).__name__}: {error}']
+    return validate(yaml_data)
+
+
+def read_prepend(use_common_lib: bool,
+                 prepend_file: Tuple[Path, ...] = None) -> Library:
+    """Load the common library and other files to prepend to a srcfile.
+
+    The files are parsed once and cached; see wv_library.
 
-    parse(yaml_input, file_out=file_out)
+    Args:
+        use_common_lib: when True, includes the build-in common library
+        prepend_file: list of files to prepend to srcfile
+
+    Returns:
+        the parsed files, with all image file paths made absolute
+    """
+    paths = [COMMON_LIB] if use_common_lib else []
+    paths.extend(prepend_file or [])
+    return load_library(paths)
+
+
+def __getattr__(name: str) -> Any:
+    # The CLI moved to wv_cli, which imports click only when it is used
+    if name == 'main':
+        from .wv_cli import main
+        return main
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
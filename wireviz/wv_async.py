@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run Graphviz as asyncio subprocesses.
+
+Used by Harness.render_async() and parse_async(), so that an event loop can
+keep many renders in flight without a thread per render. At most
+max_concurrency() Graphviz processes run at a time per event loop; a
+cancelled render kills its process.
+"""
+
+import asyncio
+import os
+import weakref
+from contextlib import suppress
+from subprocess import CalledProcessError, PIPE
+from pathlib import Path
+from typing import Dict, Sequence
+
+from .wv_profile import count, stage
+from .wv_render import formats_command
+
+_max_concurrency = os.cpu_count() or 1
+# event loop -> Semaphore limiting its Graphviz processes
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_max_concurrency(limit: int) -> None:
+    """Set how many Graphviz processes may run at a time per event loop."""
+    global _max_concurrency
+    if limit < 1:
+        raise Exception('At least one Graphviz process must be allowed')
+    _max_concurrency = limit
+    _semaphores.clear()
+
+
+def max_concurrency() -> int:
+    return _max_concurrency
+
+
+def _semaphore() -> asyncio.Semaphore:
+    # Semaphores belong to the event loop they were created in
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(_max_concurrency)
+    return semaphore
+
+
+async def run_graphviz_async(cmd: Sequence[str], source: bytes,
+                             cwd: (str, Path) = None) -> bytes:
+    """Like wv_render.run_graphviz(), without blocking the event loop."""
+    async with _semaphore():
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, cwd=cwd)
+        except FileNotFoundError:
+            from graphviz import ExecutableNotFound
+            raise ExecutableNotFound(cmd)
+        try:
+            with stage('graphviz'):
+                stdout, stderr = await proc.communicate(source)
+        except BaseException:  # e.g. cancelled
+            if proc.returncode is None:
+                with suppress(ProcessLookupError):
+                    proc.kill()
+                await proc.wait()
+            raise
+    count('graphviz_runs')
+    if proc.returncode:
+        raise CalledProcessError(proc.returncode, cmd, output=stdout,
+                                 stderr=stderr)
+    return stdout
+
+
+async def render_async(source: str,
+                       formats: Sequence[str],
+                       engine: str = 'dot',
+                       encoding: str = 'utf-8',
+                       cwd: (str, Path) = None) -> Dict[str, bytes]:
+    """Like wv_render.pipe_formats(), without blocking the event loop.
+
+    Relative image paths are resolved against cwd, see run_graphviz().
+    """
+    formats = list(dict.fromkeys(formats))
+    if not formats:
+        return {}
+    with formats_command(engine, formats) as (cmd, collect):
+        return collect(await run_graphviz_async(cmd, source.encode(encoding),
+                                                cwd))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Render many harness files in parallel across a pool of worker processes."""
+
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from .Harness import Harness
+from .wireviz import load_harness, output_base, read_prepend, wireviz
+from .wv_cache import set_cache_dir
+from .wv_helper import save_image_sizes
+
+YAML_SUFFIXES = ('.yml', '.yaml', '.json')
+
+# Library loaded once per worker process by _init_worker(), and the other
+# arguments passed to wireviz() for every srcfile
+_worker_prepend = None
+_worker_options = {}
+
+
+@dataclass
+class BatchResult:
+    srcfile: Path
+    ok: bool
+    error: Optional[str] = None
+    seconds: float = 0
+
+
+def expand_sources(patterns: Iterable[str]) -> List[Path]:
+    """Expand files, directories and glob patterns into a list of srcfiles.
+
+    Directories are searched recursively for .yml, .yaml and .json files,
+    except the .profile.json files written by wireviz(). Duplicates are
+    removed, keeping the order in which the files were first found.
+    """
+    found = {}
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(p for p in path.rglob('*')
+                             if p.suffix.lower() in YAML_SUFFIXES
+                             and not p.name.endswith('.profile.json'))
+        elif path.is_file():
+            matches = [path]
+        elif glob.has_magic(pattern):
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True)
+                             if os.path.isfile(p))
+        else:
+            raise FileNotFoundError(f'{pattern} does not exist')
+        for match in matches:
+            found.setdefault(match.resolve(), None)
+    return list(found)
+
+
+def _init_worker(use_common_lib: bool,
+                 prepend_file: Tuple[Path, ...],
+                 cache_dir: Path = None,
+                 cache_size: int = None,
+                 options: dict = None) -> None:
+    global _worker_prepend, _worker_options
+    set_cache_dir(cache_dir, cache_size)
+    _worker_prepend = read_prepend(use_common_lib, prepend_file)
+    _worker_options = options or {}
+
+
+def _run(srcfile: Path) -> BatchResult:
+    start = time.perf_counter()
+    try:
+        wireviz(srcfile, False, prepend=_worker_prepend, **_worker_options)
+    except Exception as error:
+        return BatchResult(srcfile, False, f'{type(error).__name__}: {error}',
+                           time.perf_counter() - start)
+    return BatchResult(srcfile, True, None, time.perf_counter() - start)
+
+
+def _run_chunk(srcfiles: List[Path]) -> List[BatchResult]:
+    # Lay out the diagrams of all srcfiles with one Graphviz process per
+    # output directory, then write the output of each
+    if _worker_options.get('profile'):
+        return [_run(srcfile) for srcfile in srcfiles]
+    options = dict(_worker_options)
+    options.pop('profile', None)
+    bom_fmt = options.pop('bom_fmt', ('tsv', ))
+    errors = {}
+    loaded = []  # (index, file_out, harness, seconds)
+    for i, srcfile in enumerate(srcfiles):
+        start = time.perf_counter()
+        try:
+            file_out = output_base(srcfile, options.get('outfile'))
+            harness = load_harness(srcfile, file_out, False,
+                                   prepend=_worker_prepend)
+        except Exception as error:
+            errors[i] = BatchResult(srcfile, False,
+                                    f'{type(error).__name__}: {error}',
+                                    time.perf_counter() - start)
+            continue
+        loaded.append((i, file_out, harness, time.perf_counter() - start))
+    start = time.perf_counter()
+    # Graphviz runs in the output directory, see Harness.output()
+    render_errors = Harness.render_many(
+        [harness for _, _, harness, _ in loaded], ('png', 'svg'),
+        directories=[Path(file_out).parent for _, file_out, _, _ in loaded])
+    # the shared Graphviz runs are split evenly between the files
+    shared = (time.perf_counter() - start) / max(1, len(loaded))
+    results = dict(errors)
+    for (i, file_out, harness, seconds), error in zip(loaded, render_errors):
+        if error is not None:
+            results[i] = BatchResult(srcfiles[i], False,
+                                     f'{type(error).__name__}: {error}',
+                                     seconds + shared)
+            continue
+        start = time.perf_counter()
+        try:
+            harness.output(filename=file_out, fmt=('png', 'svg'),
+                           view=False, bom_fmt=bom_fmt)
+        except Exception as error:
+            results[i] = BatchResult(srcfiles[i], False,
+                                     f'{type(error).__name__}: {error}',
+                                     seconds + shared
+                                     + time.perf_counter() - start)
+            continue
+        results[i] = BatchResult(srcfiles[i], True, None,
+                                 seconds + shared
+                                 + time.perf_counter() - start)
+    # Worker processes never run atexit hooks, so save the sizes here
+    save_image_sizes()
+    return [results[i] for i in range(len(srcfiles))]
+
+
+def run_batch(srcfiles: List[Path],
+              use_common_lib: bool = False,
+              prepend_file: Tuple[Path, ...] = None,
+              jobs: int = None,
+              cache_dir: Path = None,
+              cache_size: int = None,
+              **options) -> List[BatchResult]:
+    """Render every srcfile next to itself using a pool of processes.
+
+    Args:
+        srcfiles: the .yaml files to parse
+        use_common_lib: when True, uses the build-in common library
+        prepend_file: list of files to prepend to every srcfile
+        jobs: number of worker processes; defaults to the number of CPUs
+        cache_dir: persistent cache directory used by the workers
+        cache_size: cache size bound in bytes, see set_cache_dir()
+        options: further keyword arguments passed to wireviz()
+
+    Returns:
+        one BatchResult per srcfile, in the same order as srcfiles
+    """
+    jobs = min(jobs or os.cpu_count() or 1, len(srcfiles)) or 1
+    initargs = (use_common_lib, tuple(prepend_file or ()), cache_dir,
+                cache_size, options)
+    # Several files per task keeps the inter-process overhead low and lets
+    # a worker lay out the whole chunk with one Graphviz process per output
+    # directory, while small enough chunks still balance the load between
+    # workers.
+    size = min(100, max(1, len(srcfiles) // (jobs * 4)))
+    chunks = [srcfiles[i:i + size] for i in range(0, len(srcfiles), size)]
+    if jobs == 1:
+        _init_worker(*initargs)
+        return list(chain.from_iterable(map(_run_chunk, chunks)))
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=_init_worker,
+                             initargs=initargs) as executor:
+        return list(chain.from_iterable(executor.map(_run_chunk, chunks)))
+
+
+def print_summary(results: List[BatchResult]) -> None:
+    for result in results:
+        if result.ok:
+            print(f'OK      {result.srcfile} ({result.seconds:.2f} s)')
+        else:
+            print(f'FAILED  {result.srcfile}: {result.error}')
+    failed = sum(1 for result in results if not result.ok)
+    print(f'{len(results) - failed} succeeded, {failed} failed, '
+          f'{len(results)} total')
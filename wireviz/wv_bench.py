@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Scaling benchmarks run on synthetic harnesses.
+
+Run ``python -m wireviz.wv_bench --help`` for usage. Every stage of turning a
+harness description into documentation is timed separately, for a series of
+harness sizes, and the resulting scaling curves are written as JSON so that
+versions and machines can be compared.
+"""
+
+import json
+import platform
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import click
+import yaml
+from graphviz import ExecutableNotFound
+
+from wireviz import __version__
+from wireviz.wireviz import parse
+from wireviz.wv_cache import FragmentCache, set_cache_dir, set_render_cache
+from wireviz.wv_library import load_yaml
+
+# Generator parameters and their defaults
+PARAMETERS = {
+    'connectors': 10,   # connectors with pins
+    'pins': 24,         # pins per connector
+    'cables': 10,       # cables, each connecting two connectors
+    'wires': 16,        # wires per cable and bundle
+    'bundles': 2,       # bundles, in addition to the cables
+    'images': 0,        # connectors and cables with an image
+    'autogenerate': 1,  # 1 to connect the ends of cables to ferrules
+}
+
+IMAGE_NAME = 'bench.png'
+
+
+def generate(connectors: int = 10, pins: int = 24, cables: int = 10,
+             wires: int = 16, bundles: int = 2, images: int = 0,
+             autogenerate: int = 1, seed: int = 0,
+             image_src: str = IMAGE_NAME) -> dict:
+    """Return the data of a synthetic harness; see PARAMETERS."""
+    rand = random.Random(seed)
+    data = {'connectors': {}, 'cables': {}, 'connections': []}
+    for i in range(connectors):
+        data['connectors'][f'X{i}'] = {
+            'type': rand.choice(['Molex KK 254', 'JST PH', 'D-Sub']),
+            'subtype': rand.choice(['female', 'male']),
+            'pn': f'CON-{rand.randrange(8)}',
+            'pinlabels': [f'S{pin}' for pin in range(1, pins + 1)],
+            'hide_disconnected_pins': rand.random() < 0.25,
+        }
+    if autogenerate:
+        data['connectors']['F'] = {'style': 'simple', 'autogenerate': True,
+                                   'type': 'Crimp ferrule'}
+    codes = ['DIN', 'IEC', 'TEL', 'T568A', None]
+    for i in range(cables):
+        cable = {'wirecount': wires,
+                 'gauge': rand.choice(['0.25 mm2', '22 AWG', '0.5 mm2']),
+                 'length': rand.choice([0.5, 1, 2]),
+                 'shield': rand.random() < 0.3,
+                 'show_equiv': True,
+                 'pn': f'CAB-{rand.randrange(8)}'}
+        code = rand.choice(codes)
+        if code:
+            cable['color_code'] = code
+        else:
+            cable['colors'] = [rand.choice(['RD', 'BK', 'WHBU', 'GNYE'])
+                               for _ in range(wires)]
+        data['cables'][f'W{i}'] = cable
+    for i in range(bundles):
+        data['cables'][f'B{i}'] = {
+            'category': 'bundle',
+            'colors': [rand.choice(['RD', 'BK', 'YE', 'BU'])
+                       for _ in range(wires)],
+            'pn': [f'WIRE-{rand.randrange(4)}' for _ in range(wires)],
+            'gauge': '0.5 mm2',
+            'length': rand.choice([0.5, 1])}
+    parts = list(data['connectors'].values())[:connectors]
+    parts += list(data['cables'].values())
+    for part in rand.sample(parts, min(images, len(parts))):
+        part['image'] = {'src': image_src, 'height': 50,
+                         'caption': 'Synthetic image'}
+
+    if connectors >= 2:
+        for name, cable in data['cables'].items():
+            count = min(wires, pins)
+            source, target = rand.sample(range(connectors), 2)
+            from_pins = rand.sample(range(1, pins + 1), count)
+            to_pins = [f'S{pin}' for pin in
+                       rand.sample(range(1, pins + 1), count)]
+            data['connections'].append([{f'X{source}': from_pins},
+                                        {name: f'1-{count}'},
+                                        {f'X{target}': to_pins}])
+    if autogenerate and wires >= 2:
+        for name in data['cables']:
+            if rand.random() < 0.5:
+                data['connections'].append([['F', 'F'],
+                                            {name: [wires - 1, wires]}])
+    data['additional_bom_items'] = [
+        {'description': 'Heat shrink sleeve', 'qty': 2,
+         'designators': list(data['cables'])[:2]}]
+    return data
+
+
+def generate_yaml(**parameters) -> str:
+    """Return the YAML text of generate(**parameters)."""
+    return yaml.safe_dump(generate(**parameters), sort_keys=False)
+
+
+def write_image(directory: Path, width: int = 20, height: int = 10) -> Path:
+    """Write a small PNG image named IMAGE_NAME to directory."""
+    def chunk(kind, payload):
+        body = kind + payload
+        return (struct.pack('>I', len(payload)) + body
+                + struct.pack('>I', zlib.crc32(body)))
+    raw = b''.join(b'\0' + b'\x80\x80\x80' * width for _ in range(height))
+    png = (b'\x89PNG\r\n\x1a\n'
+           + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0,
+                                        0, 0))
+           + chunk(b'IDAT', zlib.compress(raw))
+           + chunk(b'IEND', b''))
+    path = Path(directory) / IMAGE_NAME
+    path.write_bytes(png)
+    return path
+
+
+def time_stages(text: str, directory: Path,
+                formats: Sequence[str] = ('svg', )) -> Dict[str, float]:
+    """Run all stages once on the YAML text and return their durations.
+
+    The stages are yaml_load, parse, create_graph, create_graph_cached (the
+    same graph rebuilt from unchanged nodes), layout_<format> for each
+    format, bom, bom_list and html. Graphviz stages and html are left out
+    when Graphviz is not installed. The HTML is written to directory.
+    """
+    times = {}
+
+    def timed(stage, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        times[stage] = time.perf_counter() - start
+        return result
+
+    data = timed('yaml_load', load_yaml, text)
+    harness = timed('parse', parse, data, None, 'harness')
+    # A new fragment cache times building every node, and rebuilding the
+    # graph with it filled times an incremental run where nothing changed
+    harness.fragment_cache = FragmentCache()
+    timed('create_graph', harness.create_graph)
+    harness.invalidate()
+    timed('create_graph_cached', harness.create_graph)
+    try:
+        for fmt in formats:
+            timed(f'layout_{fmt}', harness.pipe, fmt)
+    except ExecutableNotFound:
+        formats = ()
+    timed('bom', harness.bom)
+    timed('bom_list', harness.bom_list)
+    if 'svg' in formats:
+        (directory / 'bench.svg').write_bytes(harness.pipe('svg'))
+        timed('html', harness.write_html, directory / 'bench')
+    return times
+
+
+def run(parameters: Dict[str, int], repeat: int = 3,
+        formats: Sequence[str] = ('svg', )) -> Dict[str, Any]:
+    """Benchmark one synthetic harness, keeping the fastest of repeat runs."""
+    best = {}
+    with tempfile.TemporaryDirectory(prefix='wireviz-bench-') as directory:
+        directory = Path(directory)
+        image = write_image(directory)
+        text = generate_yaml(image_src=str(image), **parameters)
+        for _ in range(repeat):
+            for stage, seconds in time_stages(text, directory,
+                                              formats).items():
+                best[stage] = min(seconds, best.get(stage, seconds))
+    return {'parameters': dict(parameters),
+            'yaml_bytes': len(text.encode('utf-8')),
+            'seconds': best,
+            'total': sum(seconds for stage, seconds in best.items()
+                         if stage != 'create_graph_cached')}
+
+
+def scaling(parameter: str, values: Sequence[int],
+            base: Dict[str, int] = None, repeat: int = 3,
+            formats: Sequence[str] = ('svg', ),
+            verbose: bool = False) -> List[Dict[str, Any]]:
+    """Benchmark harnesses where one parameter takes each of the values.
+
+    With verbose, the total time of each point is printed to stderr.
+    """
+    points = []
+    for value in values:
+        parameters = dict(PARAMETERS, **(base or {}))
+        parameters[parameter] = value
+        point = run(parameters, repeat, formats)
+        if verbose:
+            print(f'{parameter}={value}: {point["total"]:.3f} s',
+                  file=sys.stderr)
+        points.append(point)
+    return points
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the versions and machine the benchmarks run on."""
+    from wireviz.wv_render import graphviz_version
+    try:
+        graphviz = graphviz_version('dot')
+    except ExecutableNotFound:
+        graphviz = None
+    return {'wireviz': __version__,
+            'python': platform.python_version(),
+            'pyyaml': yaml.__version__,
+            'libyaml': getattr(yaml, '__with_libyaml__', False),
+            'graphviz': graphviz,
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine()}
+
+
+@click.command(context_settings={'help_option_names': ['-h', '--help']})
+@click.option('--scale', '-s',
+              type=click.Choice(list(PARAMETERS)),
+              default='connectors',
+              show_default=True,
+              help="generator parameter to vary")
+@click.option('--values', '-v',
+              default='5,10,20,40,80',
+              show_default=True,
+              help="comma separated values of the varied parameter")
+@click.option('--set', 'settings',
+              metavar='NAME=VALUE',
+              multiple=True,
+              help="fix another generator parameter, e.g. --set pins=64")
+@click.option('--format', '-f', 'formats',
+              default=('svg', ),
+              show_default=True,
+              multiple=True,
+              help="Graphviz output format(s) to time")
+@click.option('--repeat', '-r',
+              type=click.IntRange(min=1),
+              default=3,
+              show_default=True,
+              help="runs per point; the fastest is reported")
+@click.option('--output', '-o',
+              type=click.Path(dir_okay=False, writable=True),
+              help="JSON file to write; defaults to standard output")
+def main(scale: str, values: str, settings: Sequence[str],
+         formats: Sequence[str], repeat: int, output: str = None) -> None:
+    '''Time each stage of WireViz on synthetic harnesses of growing size.'''
+    base = {}
+    for setting in settings:
+        name, _, value = setting.partition('=')
+        if name not in PARAMETERS or not value.isdigit():
+            raise click.BadParameter(f'{setting!r}', param_hint='--set')
+        base[name] = int(value)
+    try:
+        values = [int(value) for value in values.split(',')]
+    except ValueError:
+        raise click.BadParameter(f'{values!r}', param_hint='--values')
+
+    # Caches would hide the work being measured
+    set_cache_dir(None)
+    set_render_cache(None)
+
+    report = {'environment': environment(),
+              'scale': scale,
+              'points': scaling(scale, values, base, repeat, formats,
+                                verbose=True)}
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
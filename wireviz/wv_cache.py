@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Persistent, content-addressed caches shared between wireviz processes.
+
+Caching is opt-in: nothing is written unless a cache directory is configured,
+either with set_cache_dir() (the CLI's --cache-dir option) or through the
+WIREVIZ_CACHE_DIR environment variable.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+CACHE_DIR_ENV = 'WIREVIZ_CACHE_DIR'
+CACHE_SIZE_ENV = 'WIREVIZ_CACHE_SIZE'  # megabytes
+
+# Temporary files older than this are left over from crashed writers
+STALE_TEMP_SECONDS = 3600
+
+_cache_dir = os.environ.get(CACHE_DIR_ENV) or None
+_cache_size = None  # bytes; CACHE_SIZE_ENV is read when this is None
+_render_cache = None
+_fragment_cache = None
+
+# (path, mtime, size) -> sha256 of the file contents
+_file_digests = {}
+
+
+def set_cache_dir(directory: (str, Path, None),
+                  max_size: Optional[int] = None) -> None:
+    """Configure the cache directory used by all caches in this process.
+
+    Args:
+        directory: the cache directory, created when needed; None disables
+            the persistent caches
+        max_size: upper bound in bytes for the rendered images kept in the
+            cache; the least recently used ones are evicted beyond that.
+            Defaults to the WIREVIZ_CACHE_SIZE environment variable, in MB.
+    """
+    global _cache_dir, _cache_size, _render_cache, _fragment_cache
+    _cache_dir = directory
+    _cache_size = max_size
+    _render_cache = None
+    _fragment_cache = None
+
+
+def get_cache_dir() -> Optional[Path]:
+    return Path(_cache_dir) if _cache_dir else None
+
+
+def get_cache_size() -> Optional[int]:
+    """Return the cache size bound in bytes, None when unbounded."""
+    if _cache_size is not None:
+        return _cache_size
+    value = os.environ.get(CACHE_SIZE_ENV, '').strip()
+    if not value:
+        return None
+    try:
+        size = int(value)
+    except ValueError:
+        size = -1
+    if size < 0:
+        print(f'Ignoring {CACHE_SIZE_ENV}={value!r}: '
+              'expected a number of megabytes')
+        return None
+    return size * 1024 * 1024 or None
+
+
+def set_render_cache(cache: Optional['RenderCache']) -> None:
+    """Use the given cache instead of the cache directory's RenderCache."""
+    global _render_cache
+    _render_cache = cache
+
+
+def get_render_cache() -> Optional['RenderCache']:
+    """Return the RenderCache of the configured cache directory, if any."""
+    global _render_cache
+    if _render_cache is None and _cache_dir:
+        _render_cache = RenderCache(Path(_cache_dir) / 'render',
+                                    get_cache_size())
+    return _render_cache
+
+
+def get_fragment_cache() -> 'FragmentCache':
+    """Return the FragmentCache of this process.
+
+    Fragments are kept in memory, and in the configured cache directory, if
+    any.
+    """
+    global _fragment_cache
+    if _fragment_cache is None:
+        directory = Path(_cache_dir) / 'fragments' if _cache_dir else None
+        _fragment_cache = FragmentCache(directory, get_cache_size())
+    return _fragment_cache
+
+
+def fingerprint(*parts: Any) -> str:
+    """Return a hash of the repr() of the given values."""
+    return hashlib.sha256(repr(parts).encode('utf-8', 'surrogateescape')
+                          ).hexdigest()
+
+
+def file_digest(path: (str, Path)) -> str:
+    """Return the sha256 of a file, or 'missing' if it cannot be read.
+
+    Digests are remembered for as long as the file's mtime and size are
+    unchanged, so each file is read at most once per process.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 'missing'
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    digest = _file_digests.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 16), b''):
+                sha.update(block)
+        digest = _file_digests[key] = sha.hexdigest()
+    return digest
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write a file such that readers never see a partially written file."""
+    import tempfile
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class RenderCache:
+    """Rendered images stored under a hash of everything that affects them.
+
+    The key covers the DOT source, the Graphviz engine and version, the output
+    format and the contents of every image file referenced by the source.
+    Entries are written atomically, so any number of processes may share the
+    directory. When max_size is given, the least recently used entries are
+    evicted once the cache grows beyond it, checked after every max_size / 16
+    bytes written.
+    """
+
+    IMG_SRC = re.compile(r'<img [^>]*src="([^"]*)"')
+
+    def __init__(self, directory: (str, Path), max_size: int = None):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self._written = 0  # bytes written since the last eviction
+
+    def key(self, source: str, fmt: str, engine: str = 'dot',
+            images: Iterable[str] = None,
+            directory: (str, Path) = None) -> str:
+        """Return the key of the source rendered by Graphviz in directory.
+
+        Relative image paths are resolved against directory, the current
+        one by default, as Graphviz running there does.
+        """
+        from .wv_render import graphviz_version
+        sha = hashlib.sha256()
+        for part in (graphviz_version(engine), engine, fmt, source):
+            sha.update(part.encode('utf-8', 'surrogateescape'))
+            sha.update(b'\0')
+        if images is None:
+            images = self.IMG_SRC.findall(source)
+        directory = os.path.abspath(directory or '.')
+        for path in sorted({os.path.join(directory, image)
+                            for image in images}):
+            sha.update(f'{path}\0{file_digest(path)}\0'.encode(
+                'utf-8', 'surrogateescape'))
+        return f'{sha.hexdigest()}.{fmt}'
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        try:
+            write_atomic(self._path(key), data)
+        except OSError as error:
+            # A read-only or full cache must not break rendering
+            print(f'RenderCache: {type(error).__name__}: {error}')
+            return
+        # Scanning the directory after each write would be quadratic, so
+        # evict once enough has been written
+        self._written += len(data)
+        if self.max_size is not None and self._written > self.max_size // 16:
+            self.evict(self.max_size)
+            self._written = 0
+
+    def evict(self, max_size: int) -> None:
+        """Delete least recently used entries until at most max_size bytes."""
+        _evict(self.directory, max_size)
+
+
+class MemoryRenderCache(RenderCache):
+    """A RenderCache kept in memory, holding at most max_entries images."""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self.entries = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.entries.pop(key, None)
+        if data is not None:
+            self.entries[key] = data  # mark as recently used
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.entries.pop(key, None)
+        self.entries[key] = data
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+
+
+class FragmentCache:
+    """Parts of a DOT source stored under a fingerprint of their inputs.
+
+    Harness.create_graph() uses it to rebuild only the nodes that changed
+    since a previous run. Fragments are kept in memory, the least recently
+    used ones being dropped beyond max_memory characters, and when a
+    directory is given, also as one file per fragment shared by all
+    processes using it. max_size bounds the directory like RenderCache does.
+    """
+
+    def __init__(self, directory: (str, Path, None) = None,
+                 max_size: int = None, max_memory: int = 8 * 1024 * 1024):
+        self.directory = Path(directory) if directory else None
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self.entries = {}  # key -> (fragment, characters)
+        self._memory = 0  # characters of the fragments in entries
+        self._written = 0  # bytes written since the last eviction
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> Optional[List[str]]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries[key] = self.entries.pop(key)  # recently used
+            return entry[0]
+        fragment = None
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as file:
+                    fragment = json.loads(file.read().decode('utf-8'))
+                os.utime(path)  # mark as recently used
+            except (OSError, ValueError):
+                return None
+        if fragment is not None:
+            self._remember(key, fragment)
+        return fragment
+
+    def put(self, key: str, fragment: List[str]) -> None:
+        self._remember(key, fragment)
+        if self.directory is None:
+            return
+        data = json.dumps(fragment).encode('utf-8')
+        try:
+            write_atomic(self._path(key), data)
+        except OSError as error:
+            print(f'FragmentCache: {type(error).__name__}: {error}')
+            return
+        # Scanning the directory after each of the many small writes would
+        # be quadratic, so evict once enough has been written
+        self._written += len(data)
+        if self.max_size is not None and self._written > self.max_size // 16:
+            _evict(self.directory, self.max_size)
+            self._written = 0
+
+    def _remember(self, key: str, fragment: List[str]) -> None:
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self._memory -= old[1]
+        size = sum(map(len, fragment))
+        self.entries[key] = (fragment, size)
+        self._memory += size
+        while self._memory > self.max_memory:
+            _, size = self.entries.pop(next(iter(self.entries)))
+            self._memory -= size
+
+
+def _evict(directory: Path, max_size: int) -> None:
+    # Delete least recently used files in the shards of directory until at
+    # most max_size bytes remain
+    entries = []
+    total = 0
+    now = time.time()
+    for shard in os.scandir(directory):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # removed by another process
+            if entry.name.startswith('.tmp-'):
+                if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                    _unlink(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_size:
+            break
+        _unlink(path)
+        total -= size
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
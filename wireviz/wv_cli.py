@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""The wireviz command line interface."""
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import click
+
+from . import __version__
+from .wireviz import COMMON_LIB, read_prepend, validate_file, wireviz
+from .wv_cache import CACHE_DIR_ENV, CACHE_SIZE_ENV, set_cache_dir
+from .wv_helper import convert_to_pathlib
+
+
+@click.command(context_settings={'help_option_names': ['-h', '--help']})
+@click.version_option(__version__, prog_name="wireviz")
+@click.argument('srcfile',
+                nargs=-1,
+                required=True,
+                type=click.Path(exists=False,
+                                file_okay=True,
+                                dir_okay=True,
+                                writable=False,
+                                readable=True,
+                                allow_dash=False))
+@click.option('--prepend-common-lib', '--common', '-c',
+              is_flag=True,
+              default=False,
+              help=("includes the rrc-wireviz common library located in "
+                    f"{COMMON_LIB!s}"))
+@click.option('--outfile', '-o',
+              type=click.Path(exists=False,
+                              file_okay=True,
+                              dir_okay=False,
+                              writable=True,
+                              readable=False,
+                              resolve_path=True,
+                              allow_dash=True),
+              help=("output file, extension is ignored; "
+                    "defaults to input filename"))
+@click.option('--prepend-file', '--prepend', '-i',  # i for include
+              type=click.Path(exists=True,
+                              file_okay=True,
+                              dir_okay=False,
+                              writable=False,
+                              readable=True,
+                              resolve_path=True,
+                              allow_dash=False),
+              help="file(s) to prepend/include to the srcfile",
+              multiple=True)
+@click.option('--jobs', '-j',
+              type=click.IntRange(min=1),
+              help=("number of processes used when rendering several "
+                    "srcfiles; defaults to the number of CPUs"))
+@click.option('--cache-dir',
+              type=click.Path(exists=False,
+                              file_okay=False,
+                              dir_okay=True,
+                              writable=True,
+                              resolve_path=True),
+              envvar=CACHE_DIR_ENV,
+              help=("directory caching rendered images between runs; may be "
+                    "shared by concurrent processes"))
+@click.option('--cache-size',
+              type=click.IntRange(min=1),
+              help=("evict least recently used cache entries beyond this many "
+                    f"MB; defaults to ${CACHE_SIZE_ENV}"))
+@click.option('--bom-format', '-b',
+              type=click.Choice(['tsv', 'csv', 'jsonl'], case_sensitive=False),
+              default=('tsv', ),
+              show_default=True,
+              multiple=True,
+              help="BOM file format(s) to write")
+@click.option('--watch', '-w',
+              is_flag=True,
+              default=False,
+              help=("re-render whenever the srcfile, prepended files or "
+                    "images change; stop with Ctrl+C"))
+@click.option('--check',
+              is_flag=True,
+              default=False,
+              help=("only check the srcfiles for errors, without rendering "
+                    "or writing any output"))
+@click.option('--profile',
+              is_flag=True,
+              default=False,
+              help=("write the time spent in each stage to "
+                    "<outfile>.profile.json"))
+def main(srcfile: Tuple[str, ...],
+         prepend_common_lib: bool,
+         outfile: Optional[Path] = None,
+         prepend_file: Optional[Tuple[Path, ...]] = None,
+         jobs: Optional[int] = None,
+         cache_dir: Optional[Path] = None,
+         cache_size: Optional[int] = None,
+         bom_format: Tuple[str, ...] = ('tsv', ),
+         watch: bool = False,
+         check: bool = False,
+         profile: bool = False) -> None:
+    '''Generate cable and wiring harness documentation from YAML descriptions.
+
+    SRCFILE may be given several times, and may be a directory (searched
+    recursively for .yml/.yaml/.json files) or a glob pattern. Several
+    srcfiles are rendered in parallel and a summary is printed at the end.
+
+    Documentation can be found on the ISBU Hardware Wiki:
+    http://isbuhome/isbuwiki/index.php/Wireviz
+    '''
+    from .wv_batch import expand_sources, run_batch, print_summary
+
+    try:
+        srcfiles = expand_sources(srcfile)
+    except FileNotFoundError as error:
+        raise click.BadParameter(str(error), param_hint='SRCFILE')
+    if not srcfiles:
+        raise click.BadParameter('no .yml, .yaml or .json files found',
+                                 param_hint='SRCFILE')
+
+    if outfile:
+        outfile = convert_to_pathlib(outfile)
+    if prepend_file:
+        prepended_file = ()
+        for i, file in enumerate(prepend_file):
+            prepended_file += (convert_to_pathlib(file),)
+        prepend_file = prepended_file
+    # Without --cache-size, set_cache_dir() falls back to $WIREVIZ_CACHE_SIZE
+    set_cache_dir(cache_dir, cache_size * 1024 * 1024 if cache_size else None)
+
+    if check:
+        if watch:
+            raise click.UsageError('--check cannot be used with --watch')
+        check_srcfiles(srcfiles, prepend_common_lib, prepend_file)
+        return
+
+    single = len(srcfiles) == 1 and not any(Path(s).is_dir() for s in srcfile)
+    if watch:
+        if not single:
+            raise click.UsageError('--watch requires a single srcfile')
+        from .wv_watch import watch as watch_srcfile
+        watch_srcfile(srcfiles[0], prepend_common_lib, outfile, prepend_file,
+                      bom_fmt=bom_format, profile=profile)
+        return
+
+    if single:
+        wireviz(srcfiles[0], prepend_common_lib, outfile, prepend_file,
+                bom_fmt=bom_format, profile=profile)
+        return
+
+    if outfile:
+        raise click.UsageError('--outfile cannot be used with several '
+                               'srcfiles')
+    results = run_batch(srcfiles, prepend_common_lib, prepend_file, jobs,
+                        cache_dir, cache_size, bom_fmt=bom_format,
+                        profile=profile)
+    print_summary(results)
+    if not all(result.ok for result in results):
+        raise SystemExit(1)
+
+
+def check_srcfiles(srcfiles: List[Path],
+                   use_common_lib: bool,
+                   prepend_file: Tuple[Path, ...] = None) -> None:
+    """Print the errors found in every srcfile; exit with 1 if there are any."""
+    prepend = read_prepend(use_common_lib, prepend_file)
+    failed = 0
+    for srcfile in srcfiles:
+        errors = validate_file(srcfile, prepend=prepend)
+        if errors:
+            failed += 1
+            for error in errors:
+                print(f'FAILED  {srcfile}: {error}')
+        else:
+            print(f'OK      {srcfile}')
+    print(f'{len(srcfiles) - failed} valid, {failed} invalid, '
+          f'{len(srcfiles)} total')
+    if failed:
+        raise SystemExit(1)
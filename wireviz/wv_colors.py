@@ -276,8 +276,32 @@ _color_ger = {
 
 color_default = '#ffffff'
 
+COLOR_MODES = ('full', 'FULL', 'hex', 'HEX', 'ger', 'GER', 'short', 'SHORT')
+
+# Lookup tables with the colors of every color code, filled by _compile(), and
+# with other valid colors on first use, so that translating a color is a
+# single dict lookup
+_hex_lookup = {}
+_hex_lookup_padded = {}
+_translation_lookup = {mode: {} for mode in COLOR_MODES}
+
+
+def _split(input):
+    return [input[i:i + 2] for i in range(0, len(input), 2)]
+
+
+def _is_known(input):
+    return all(color in _color_hex for color in _split(input))
+
 
 def get_color_hex(input, pad=False):
+    # The returned list is shared between calls and must not be modified
+    table = _hex_lookup_padded if pad else _hex_lookup
+    try:
+        return table[input]
+    except KeyError:
+        pass
+
     if input is None or input == '':
         return [color_default]
 
@@ -292,34 +316,69 @@ def get_color_hex(input, pad=False):
         padded = input
 
     try:
-        output = [_color_hex[padded[i:i + 2]] for i in range(0, len(padded), 2)]
+        output = [_color_hex[color] for color in _split(padded)]
     except KeyError:
         print(f'Unknown color specified: {input}')
-        output = [color_default]
+        return [color_default]
+    table[input] = output
     return output
 
 
 def translate_color(input, color_mode):
+    try:
+        return _translation_lookup[color_mode][input]
+    except KeyError:
+        pass
+
     if input == '' or input is None:
         return ''
     upper = color_mode.isupper()
     if not (color_mode.isupper() or color_mode.islower()):
         raise Exception('Unknown color mode capitalization')
 
-    color_mode = color_mode.lower()
-    if color_mode == 'full':
-        output = "/".join([_color_full[input[i:i + 2]]
-                           for i in range(0, len(input), 2)])
-    elif color_mode == 'hex':
+    mode = color_mode.lower()
+    if mode == 'full':
+        output = "/".join([_color_full[color] for color in _split(input)])
+    elif mode == 'hex':
         output = ':'.join(get_color_hex(input, pad=False))
-    elif color_mode == 'ger':
-        output = "".join([_color_ger[input[i:i + 2]]
-                          for i in range(0, len(input), 2)])
-    elif color_mode == 'short':
+    elif mode == 'ger':
+        output = "".join([_color_ger[color] for color in _split(input)])
+    elif mode == 'short':
         output = input
     else:
         raise Exception('Unknown color mode')
-    if upper:
-        return output.upper()
-    else:
-        return output.lower()
+    output = output.upper() if upper else output.lower()
+    # unknown colors are not remembered, so that they are reported every time
+    if _is_known(input):
+        _translation_lookup[color_mode][input] = output
+    return output
+
+
+def _compile(colors):
+    # Add the colors to the lookup tables
+    for color in colors:
+        get_color_hex(color, pad=False)
+        get_color_hex(color, pad=True)
+        for mode in COLOR_MODES:
+            translate_color(color, mode)
+
+
+def register_color_code(name, colors):
+    """Add a color code, e.g. of a company standard, or replace one.
+
+    Cables can then use it as their color_code. Each color is made of known
+    two letter colors, e.g. 'WHBU' for white with blue stripes.
+    """
+    colors = list(colors)
+    if not colors:
+        raise Exception(f'Color code {name} has no colors')
+    for color in colors:
+        if not isinstance(color, str) or not color or len(color) % 2 \
+                or not _is_known(color):
+            raise Exception(f'Unknown color {color!r} in color code {name}')
+    _compile(colors)
+    COLOR_CODES[name] = colors
+
+
+for _colors in COLOR_CODES.values():
+    _compile(_colors)
@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import csv
+import json
+import struct
+from collections.abc import Sequence
+from functools import lru_cache
+from io import StringIO
+from itertools import chain
 from pathlib import Path
 
 from . import wv_colors
+from .wv_cache import get_cache_dir, write_atomic
 
 awg_equiv_table = {
     '0.09': '28',
@@ -120,41 +128,108 @@ def html_size_attr(image):
     return ret
 
 
+class Expansion(Sequence):
+    """Read-only sequence of the pins expanded from a spec by expand().
+
+    Ranges are kept as range objects, so the length is computed without
+    listing them and pins are only produced when iterated over.
+    """
+    __slots__ = ('_parts', '_len')
+
+    def __init__(self, parts):
+        self._parts = parts  # ranges and tuples of single values
+        self._len = sum(len(part) for part in parts)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._parts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += self._len
+        if 0 <= index < self._len:
+            for part in self._parts:
+                if index < len(part):
+                    return part[index]
+                index -= len(part)
+        raise IndexError('Expansion index out of range')
+
+    def __eq__(self, other):
+        if isinstance(other, (Expansion, list, tuple)):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _expand_element(e):
+    # Return a range, or the single value, for one element of expand()
+    if type(e) is int and e >= 0:
+        return e  # same as converting to str and back
+    e = str(e)
+    if '-' in e:
+        a, b = e.split('-', 1)
+        try:
+            a = int(a)
+            b = int(b)
+        # '-' was not a delimiter between two ints, pass e through unchanged
+        except ValueError:
+            return e
+        if a <= b:
+            return range(a, b + 1)  # ascending range, or of length 1
+        return range(a, b - 1, -1)  # descending range
+    try:
+        return int(e)  # single int
+    except ValueError:
+        return e  # string
+
+
+def _expansion(yaml_data):
+    parts = []
+    singles = []
+    for e in yaml_data:
+        x = _expand_element(e)
+        if isinstance(x, range):
+            if singles:
+                parts.append(tuple(singles))
+                singles = []
+            parts.append(x)
+        else:
+            singles.append(x)
+    if singles:
+        parts.append(tuple(singles))
+    return Expansion(tuple(parts))
+
+
+@lru_cache(maxsize=4096)
+def _cached_expansion(yaml_data):
+    return _expansion(yaml_data)
+
+
 def expand(yaml_data):
     # yaml_data can be:
     # - a singleton (normally str or int)
     # - a list of str or int
     # if str is of the format '#-#', it is treated
     # as a range (inclusive) and expanded
-    output = []
+    # The result is an Expansion, shared between equal specs of str and int
     if not isinstance(yaml_data, list):
-        yaml_data = [yaml_data]
-    for e in yaml_data:
-        e = str(e)
-        if '-' in e:
-            a, b = e.split('-', 1)
-            try:
-                a = int(a)
-                b = int(b)
-                if a < b:
-                    for x in range(a, b + 1):
-                        output.append(x)  # ascending range
-                elif a > b:
-                    for x in range(a, b - 1, -1):
-                        output.append(x)  # descending range
-                else:  # a == b
-                    output.append(a)  # range of length 1
-
-            # '-' was not a delimiter between two ints, pass e through unchanged
-            except:  # noqa
-                output.append(e)
-        else:
-            try:
-                x = int(e)  # single int
-            except Exception:
-                x = e  # string
-            output.append(x)
-    return output
+        yaml_data = (yaml_data, )
+    else:
+        yaml_data = tuple(yaml_data)
+    # other types, e.g. True == 1, would share results with different ones
+    if all(type(e) is str or type(e) is int for e in yaml_data):
+        return _cached_expansion(yaml_data)
+    return _expansion(yaml_data)
 
 
 def int2tuple(inp):
@@ -165,20 +240,56 @@ def int2tuple(inp):
     return output
 
 
+def flatten_cell(item):
+    return str(item) if not isinstance(item, list) else ', '.join(item)
+
+
 def flatten2d(inp):
-    return [[str(item) if not isinstance(item, list) else ', '.join(item)
-             for item in row]
-            for row in inp]
+    return [[flatten_cell(item) for item in row] for row in inp]
 
 
 def tuplelist2tsv(inp, header=None):
-    output = ''
-    if header is not None:
-        inp.insert(0, header)
-    inp = flatten2d(inp)
-    for row in inp:
-        output = output + '\t'.join(str(item) for item in row) + '\n'
-    return output
+    output = StringIO()
+    write_tsv(output, chain([header], inp) if header is not None else inp)
+    return output.getvalue()
+
+
+# Streaming table writers: rows are consumed one at a time and written
+# straight to the (buffered) file, without building the whole output first.
+def write_tsv(file, rows):
+    for row in rows:
+        file.write('\t'.join([flatten_cell(item) for item in row]) + '\n')
+
+
+def write_csv(file, rows):
+    # file should be opened with newline=''
+    csv.writer(file).writerows([flatten_cell(item) for item in row]
+                               for row in rows)
+
+
+def write_jsonl(file, items):
+    for item in items:
+        file.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+def html_bom_table(rows):
+    # Yield the HTML of a table of flattened rows, the first being the header
+    header = rows[0]
+    yield ('<table style="border:1px solid #000000; '
+           'font-size: 14pt; border-spacing: 0px">')
+    yield '<tr>'
+    for item in header:
+        yield ('<th style="text-align:left; '
+               f'border:1px solid #000000; padding: 8px">{item}</th>')
+    yield '</tr>'
+    cells = [f'<td style="{"text-align:right; " if item == "Qty" else ""}'
+             'border:1px solid #000000; padding: 4px">' for item in header]
+    for row in rows[1:]:
+        yield '<tr>'
+        for cell, item in zip(cells, row):
+            yield cell + item.replace('\u00b2', '&sup2;') + '</td>'
+        yield '</tr>'
+    yield '</table>'
 
 
 # Return the value indexed if it is a list, or simply the value otherwise.
@@ -205,8 +316,8 @@ def open_file_read(filename):
     return open(filename, 'r', encoding='UTF-8')
 
 
-def open_file_write(filename):
-    return open(filename, 'w', encoding='UTF-8')
+def open_file_write(filename, newline=None):
+    return open(filename, 'w', encoding='UTF-8', newline=newline)
 
 
 def open_file_append(filename):
@@ -215,12 +326,11 @@ def open_file_append(filename):
 
 def aspect_ratio(image_src):
     try:
-        from PIL import Image
-        image = Image.open(image_src)
-        if image.width > 0 and image.height > 0:
-            return image.width / image.height
+        width, height = image_size(image_src)
+        if width > 0 and height > 0:
+            return width / height
         print('aspect_ratio(): Invalid image size '
-              f'{image.width} x {image.height}')
+              f'{width} x {height}')
     # ModuleNotFoundError and FileNotFoundError are the most expected,
     # but all are handled equally.
     except Exception as error:
@@ -228,6 +338,116 @@ def aspect_ratio(image_src):
     return 1  # Assume 1:1 when unable to read actual image size
 
 
+# 'resolved path|mtime|size' -> (width, height) or the error raised
+_image_sizes = {}
+# keys not yet saved, and the cache directory _image_sizes was loaded from
+_image_sizes_dirty = set()
+_image_sizes_dir = None
+IMAGE_SIZES_FILE = 'images.json'
+
+
+def image_size(image_src):
+    """Return the (width, height) of an image file in pixels.
+
+    Only the file header is read for PNG, GIF and JPEG files; PIL is used for
+    other formats. Results are kept for as long as the file's mtime and size
+    are unchanged, and persisted in the cache directory when one is set.
+    """
+    path = Path(image_src).resolve()
+    stat = path.stat()
+    key = f'{path}|{stat.st_mtime_ns}|{stat.st_size}'
+    if get_cache_dir() != _image_sizes_dir:
+        _load_image_sizes()
+    size = _image_sizes.get(key)
+    if size is None:
+        try:
+            size = _image_header_size(path)
+            if size is None:
+                from PIL import Image
+                with Image.open(path) as image:
+                    size = image.size
+        except Exception as error:
+            size = error
+        else:
+            size = tuple(size)
+            if _image_sizes_dir is not None:
+                _image_sizes_dirty.add(key)
+        _image_sizes[key] = size
+    if isinstance(size, Exception):
+        raise size.with_traceback(None)
+    return size
+
+
+def _image_header_size(path):
+    with open(path, 'rb') as file:
+        head = file.read(26)
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if head[:2] == b'\xff\xd8':
+            return _jpeg_size(file)
+    return None
+
+
+def _jpeg_size(file):
+    # Walk the JPEG segments up to the first start of frame (SOFn) marker
+    file.seek(2)
+    while True:
+        marker = file.read(2)
+        while marker[:1] == b'\xff' and marker[1:] == b'\xff':
+            marker = marker[1:] + file.read(1)  # fill bytes
+        if len(marker) < 2 or marker[0] != 0xff:
+            return None
+        if 0xd0 <= marker[1] <= 0xd9 or marker[1] == 0x01:
+            continue  # markers without a length
+        length = file.read(2)
+        if len(length) < 2:
+            return None
+        if (0xc0 <= marker[1] <= 0xcf
+                and marker[1] not in (0xc4, 0xc8, 0xcc)):
+            data = file.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        file.seek(struct.unpack('>H', length)[0] - 2, 1)
+
+
+def _load_image_sizes():
+    global _image_sizes_dir
+    save_image_sizes()  # to the previous cache directory
+    cache_dir = _image_sizes_dir = get_cache_dir()
+    if cache_dir is None:
+        return
+    try:
+        with open(cache_dir / IMAGE_SIZES_FILE, encoding='UTF-8') as file:
+            stored = json.load(file)
+    except (OSError, ValueError):
+        return
+    for key, size in stored.items():
+        _image_sizes.setdefault(key, tuple(size))
+
+
+def save_image_sizes():
+    """Merge newly read image sizes into the file in the cache directory."""
+    if _image_sizes_dir is None or not _image_sizes_dirty:
+        return
+    path = _image_sizes_dir / IMAGE_SIZES_FILE
+    try:
+        with open(path, encoding='UTF-8') as file:
+            stored = json.load(file)
+    except (OSError, ValueError):
+        stored = {}
+    for key in _image_sizes_dirty:
+        stored[key] = _image_sizes[key]
+    try:
+        write_atomic(path, json.dumps(stored).encode('UTF-8'))
+    except OSError as error:
+        print(f'save_image_sizes(): {type(error).__name__}: {error}')
+    _image_sizes_dirty.clear()
+
+
 def manufacturer_info_field(manufacturer, mpn):
     if manufacturer or mpn:
         return f'{manufacturer or "MPN"}{": " + str(mpn) if mpn else ""}'
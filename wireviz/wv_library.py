@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Parse-once cache for the common library and other prepended files.
+
+Prepending a library used to mean concatenating its text in front of the
+harness and parsing the result. A Library keeps what that concatenation
+provided in parsed form instead:
+
+- the anchors it defines, so the harness can still refer to library parts
+  with aliases such as ``<<: *31-00905-02``;
+- its top-level sections, which the harness replaces section by section,
+  just like duplicate keys in the concatenated text did.
+
+Libraries are cached in memory, keyed by file path, mtime and size, and
+written to the configured cache directory (see wv_cache) for use by later
+processes. There they are stored as JSON data describing the YAML nodes,
+which loading constructs with the safe loader only, so a shared cache
+directory cannot inject code.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import yaml
+
+from .wv_cache import get_cache_dir, write_atomic
+
+# Bump when the stored representation changes
+CACHE_FORMAT = 2
+
+# paths -> (stat key, Library); one entry per combination of files
+_libraries = {}
+
+# The libyaml based loader, when PyYAML was built with it, is many times
+# faster than the pure Python one and loads the same data
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Anchors and aliases; may also match inside scalars, which only means that
+# the slower loader is used
+_ANCHOR_OR_ALIAS = re.compile(r'[&*][^\s,\[\]{}]')
+
+
+def load_yaml(yaml_input: str) -> Any:
+    """Parse a YAML document like yaml.safe_load(), with libyaml if built."""
+    return yaml.load(yaml_input, Loader=SafeLoader)
+
+
+class _LibraryLoader(yaml.SafeLoader):
+    # Keeps the anchors of the composed document for later documents
+
+    def compose_document(self):
+        self.get_event()
+        node = self.compose_node(None, None)
+        self.get_event()
+        return node
+
+
+class Library:
+    """Parsed library files to combine with a harness document."""
+
+    def __init__(self,
+                 anchors: Dict[str, yaml.Node] = None,
+                 sections: List[Tuple[str, yaml.Node]] = None):
+        self.anchors = anchors or {}
+        self.sections = sections or []
+
+    def extend(self, text: str, base: Path) -> 'Library':
+        """Return a new library with the given file text appended.
+
+        Image src paths in the text are made absolute relative to base.
+        """
+        loader = _LibraryLoader(text)
+        try:
+            loader.anchors = dict(self.anchors)
+            node = loader.get_single_node()
+            anchors = loader.anchors
+        finally:
+            loader.dispose()
+        sections = dict(self.sections)
+        if node is not None:
+            _resolve_src(node, base)
+            _strip_marks(node)
+            if not isinstance(node, yaml.MappingNode):
+                raise Exception(f'{base}: a library must be a mapping')
+            for key, value in node.value:
+                if not isinstance(key, yaml.ScalarNode):
+                    raise Exception(f'{base}: unexpected library key')
+                sections.pop(key.value, None)  # keep the original key order
+                sections[key.value] = value
+        return Library(anchors, list(sections.items()))
+
+    def load(self, yaml_input: str) -> dict:
+        """Parse a harness document as if the library text preceded it."""
+        # Only the pure Python loader can be seeded with the library anchors,
+        # so it is used when the document may refer to them or redefine them
+        if not self.anchors or not _ANCHOR_OR_ALIAS.search(yaml_input):
+            data = load_yaml(yaml_input)
+            return self.merge(data if data is not None else {})
+        loader = yaml.SafeLoader(yaml_input)
+        try:
+            loader.anchors = dict(self.anchors)
+            node = loader.get_single_node()
+            data = loader.construct_document(node) if node is not None else {}
+        finally:
+            loader.dispose()
+        return self.merge(data)
+
+    def merge(self, data: dict) -> dict:
+        """Add the library sections that the harness data does not replace."""
+        if not self.sections:
+            return data
+        if not isinstance(data, dict):
+            raise Exception('The harness document must be a mapping')
+        merged = {}
+        for key, value in self.sections:
+            if key not in data:
+                loader = yaml.SafeLoader('')
+                try:
+                    merged[key] = loader.construct_document(value)
+                finally:
+                    loader.dispose()
+        merged.update(data)
+        return merged
+
+
+def _walk(node: yaml.Node, seen: set):
+    if id(node) in seen:
+        return
+    seen.add(id(node))
+    yield node
+    if isinstance(node, yaml.MappingNode):
+        for key, value in node.value:
+            yield from _walk(key, seen)
+            yield from _walk(value, seen)
+    elif isinstance(node, yaml.SequenceNode):
+        for item in node.value:
+            yield from _walk(item, seen)
+
+
+def _resolve_src(root: yaml.Node, base: Path) -> None:
+    for node in _walk(root, set()):
+        if isinstance(node, yaml.MappingNode):
+            for key, value in node.value:
+                if (isinstance(key, yaml.ScalarNode) and key.value == 'src'
+                        and isinstance(value, yaml.ScalarNode)):
+                    value.value = str((base / value.value).resolve())
+
+
+def _strip_marks(root: yaml.Node) -> None:
+    # Marks reference the whole source text; keep only their positions so
+    # that cached libraries stay small while errors still report a location.
+    for node in _walk(root, set()):
+        for attr in ('start_mark', 'end_mark'):
+            mark = getattr(node, attr)
+            if mark is not None and mark.buffer is not None:
+                setattr(node, attr, yaml.Mark(mark.name, mark.index, mark.line,
+                                              mark.column, None, None))
+
+
+def _stat_key(paths: Sequence[Path]) -> tuple:
+    key = []
+    for path in paths:
+        stat = os.stat(path)
+        key.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(key)
+
+
+def _disk_path(key: tuple) -> (Path, None):
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    digest = hashlib.sha256(repr((CACHE_FORMAT, yaml.__version__, key))
+                            .encode('utf-8')).hexdigest()
+    return cache_dir / 'library' / f'{digest}.json'
+
+
+def _mark_to_data(mark: yaml.Mark) -> (list, None):
+    if mark is None:
+        return None
+    return [mark.name, mark.index, mark.line, mark.column]
+
+
+def _data_to_mark(data: (list, None)) -> (yaml.Mark, None):
+    if data is None:
+        return None
+    name, index, line, column = data
+    return yaml.Mark(str(name), int(index), int(line), int(column), None,
+                     None)
+
+
+def _library_to_data(library: Library) -> dict:
+    # The nodes of the library as a table, so that nodes shared through
+    # anchors, and recursive ones, stay shared
+    ids = {}
+    nodes = []
+    roots = [*library.anchors.values(),
+             *(node for _, node in library.sections)]
+    for root in roots:
+        for node in _walk(root, set()):
+            if id(node) not in ids:
+                ids[id(node)] = len(nodes)
+                nodes.append(node)
+    table = []
+    for node in nodes:
+        entry = {'tag': node.tag,
+                 'start': _mark_to_data(node.start_mark),
+                 'end': _mark_to_data(node.end_mark)}
+        if isinstance(node, yaml.ScalarNode):
+            entry.update(kind='scalar', value=node.value, style=node.style)
+        elif isinstance(node, yaml.SequenceNode):
+            entry.update(kind='sequence', flow=node.flow_style,
+                         value=[ids[id(item)] for item in node.value])
+        else:
+            entry.update(kind='mapping', flow=node.flow_style,
+                         value=[[ids[id(key)], ids[id(value)]]
+                                for key, value in node.value])
+        table.append(entry)
+    return {'nodes': table,
+            'anchors': {name: ids[id(node)]
+                        for name, node in library.anchors.items()},
+            'sections': [[key, ids[id(node)]]
+                         for key, node in library.sections]}
+
+
+def _data_to_library(data: dict) -> Library:
+    nodes = []
+    for entry in data['nodes']:
+        start = _data_to_mark(entry['start'])
+        end = _data_to_mark(entry['end'])
+        tag = str(entry['tag'])
+        if entry['kind'] == 'scalar':
+            if not isinstance(entry['value'], str):
+                raise ValueError('invalid scalar node')
+            nodes.append(yaml.ScalarNode(tag, entry['value'], start, end,
+                                         entry['style']))
+        elif entry['kind'] == 'sequence':
+            nodes.append(yaml.SequenceNode(tag, [], start, end,
+                                           bool(entry['flow'])))
+        elif entry['kind'] == 'mapping':
+            nodes.append(yaml.MappingNode(tag, [], start, end,
+                                          bool(entry['flow'])))
+        else:
+            raise ValueError('invalid node kind')
+    # fill in the children once every node exists
+    for node, entry in zip(nodes, data['nodes']):
+        if isinstance(node, yaml.SequenceNode):
+            node.value = [nodes[i] for i in entry['value']]
+        elif isinstance(node, yaml.MappingNode):
+            node.value = [(nodes[k], nodes[v]) for k, v in entry['value']]
+    return Library({str(name): nodes[i]
+                    for name, i in data['anchors'].items()},
+                   [(str(key), nodes[i]) for key, i in data['sections']])
+
+
+def load_library(paths: Sequence[Path]) -> Library:
+    """Return the parsed combination of the given files, in order."""
+    paths = tuple(Path(path).resolve() for path in paths)
+    if not paths:
+        return Library()
+    key = _stat_key(paths)
+    cached = _libraries.get(paths)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    library = None
+    disk_path = _disk_path(key)
+    if disk_path is not None:
+        try:
+            with open(disk_path, 'rb') as file:
+                library = _data_to_library(json.loads(file.read()))
+        except Exception:  # missing, or written by an incompatible version
+            library = None
+    if library is None:
+        library = load_library(paths[:-1])
+        with open(paths[-1], encoding='UTF-8') as file:
+            library = library.extend(file.read(), paths[-1].parent)
+        if disk_path is not None:
+            try:
+                write_atomic(disk_path, json.dumps(
+                    _library_to_data(library)).encode('utf-8'))
+            except OSError as error:
+                print(f'load_library(): {type(error).__name__}: {error}')
+    _libraries[paths] = (key, library)
+    return library
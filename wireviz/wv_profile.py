@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Timing of the stages of a wireviz run.
+
+parse(), wireviz(), Harness.create_graph(), Harness.output(), Harness.bom()
+and the Graphviz calls report their stages and counters to the Profile made
+active with profiling(). Without an active Profile, stage() returns a shared
+no-op context manager and count() returns immediately, so the hooks cost
+next to nothing.
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional
+
+_profile = None
+_disabled = nullcontext()
+
+
+class Profile:
+    """Time spent per stage and counters of one run.
+
+    Stages may nest, e.g. graphviz within output, and a stage entered several
+    times accumulates. Subclasses may override start() and stop() to forward
+    the events elsewhere.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def start(self, name: str) -> None:
+        pass
+
+    def stop(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0) + seconds
+
+    def count(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'stages': dict(self.stages), 'counters': dict(self.counters)}
+
+
+class _Stage:
+
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.start(self.name)
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profile.stop(self.name, time.perf_counter() - self.started)
+
+
+def get_profile() -> Optional[Profile]:
+    """Return the active Profile, if any."""
+    return _profile
+
+
+@contextmanager
+def profiling(profile: Profile = None):
+    """Make profile (a new Profile by default) active within the block."""
+    global _profile
+    previous = _profile
+    _profile = profile if profile is not None else Profile()
+    try:
+        yield _profile
+    finally:
+        _profile = previous
+
+
+def stage(name: str):
+    """Return a context manager timing the stage called name."""
+    if _profile is None:
+        return _disabled
+    return _Stage(_profile, name)
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add value to the counter called name."""
+    if _profile is not None:
+        _profile.count(name, value)
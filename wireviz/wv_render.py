@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Run Graphviz directly, so that several formats share one layout pass."""
+
+import functools
+import os
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+from .wv_profile import count, stage
+
+
+def run_graphviz(cmd: Sequence[str], source: bytes,
+                 cwd: (str, Path) = None) -> bytes:
+    """Run a Graphviz command with the DOT source on stdin, return stdout.
+
+    Relative image paths in the source are resolved against cwd, which
+    defaults to the current directory.
+    """
+    import subprocess
+    try:
+        with stage('graphviz'):
+            proc = subprocess.run(cmd, input=source, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, cwd=cwd)
+    except FileNotFoundError:
+        from graphviz import ExecutableNotFound
+        raise ExecutableNotFound(cmd)
+    count('graphviz_runs')
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd,
+                                            output=proc.stdout,
+                                            stderr=proc.stderr)
+    return proc.stdout
+
+
+def pipe(source: str,
+         fmt: str,
+         engine: str = 'dot',
+         encoding: str = 'utf-8',
+         cwd: (str, Path) = None) -> bytes:
+    """Return the graph rendered in the given format, see run_graphviz()."""
+    return run_graphviz([engine, f'-T{fmt}'], source.encode(encoding), cwd)
+
+
+def render(source: str,
+           filename: (str, Path),
+           formats: Sequence[str],
+           engine: str = 'dot',
+           encoding: str = 'utf-8') -> None:
+    """Lay out the graph once and write filename.<fmt> for every format.
+
+    Graphviz accepts any number of -T<fmt> -o <file> pairs in one invocation
+    and renders all of them from the same layout. Like the graphviz package,
+    it runs in the directory of filename, which relative image paths are
+    resolved against.
+    """
+    if not formats:
+        return
+    path = Path(filename)
+    cmd = [engine]
+    for f in formats:
+        cmd += [f'-T{f}', '-o', f'{path.name}.{f}']
+    run_graphviz(cmd, source.encode(encoding), path.parent)
+
+
+# Formats whose output for a stream of graphs can be split per graph
+BATCH_FORMATS = ('svg', 'png')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def split_output(data: bytes, fmt: str) -> List[bytes]:
+    """Split the output of Graphviz for several graphs into one per graph."""
+    if fmt == 'svg':
+        # every document starts with an XML declaration; labels cannot
+        # contain one, since Graphviz escapes their markup
+        starts = []
+        start = data.find(b'<?xml')
+        while start != -1:
+            starts.append(start)
+            start = data.find(b'<?xml', start + 1)
+        if not starts or starts[0] != 0:
+            raise Exception('Unexpected SVG output from Graphviz')
+        return [data[a:b] for a, b in zip(starts, starts[1:] + [len(data)])]
+    if fmt == 'png':
+        # every image ends with its IEND chunk
+        images = []
+        start = 0
+        while start < len(data):
+            if not data.startswith(PNG_SIGNATURE, start):
+                raise Exception('Unexpected PNG output from Graphviz')
+            pos = start + len(PNG_SIGNATURE)
+            while True:
+                length, = struct.unpack('>I', data[pos:pos + 4])
+                kind = data[pos + 4:pos + 8]
+                pos += length + 12  # length, type, data and CRC
+                if kind == b'IEND' or pos >= len(data):
+                    break
+            images.append(data[start:pos])
+            start = pos
+        return images
+    raise Exception(f'Cannot split {fmt} output; use one of {BATCH_FORMATS}')
+
+
+@contextmanager
+def formats_command(engine: str, formats: Sequence[str]
+                    ) -> Iterator[Tuple[List[str], Callable]]:
+    """Yield the command rendering a graph in every format from one layout.
+
+    Also yields collect(stdout), which returns {format: data} once the
+    command has run. Graphviz writes several formats only to files, which
+    are kept in a temporary directory until the with block ends.
+    """
+    if len(formats) == 1:
+        yield [engine, f'-T{formats[0]}'], lambda stdout: {formats[0]: stdout}
+        return
+    import tempfile
+    with tempfile.TemporaryDirectory(prefix='wireviz-') as directory:
+        paths = {f: os.path.join(directory, f'graph.{f}') for f in formats}
+        cmd = [engine]
+        for f, path in paths.items():
+            cmd += [f'-T{f}', '-o', path]
+
+        def collect(stdout: bytes) -> Dict[str, bytes]:
+            rendered = {}
+            for f, path in paths.items():
+                with open(path, 'rb') as file:
+                    rendered[f] = file.read()
+            return rendered
+
+        yield cmd, collect
+
+
+def pipe_formats(source: str,
+                 formats: Sequence[str],
+                 engine: str = 'dot',
+                 encoding: str = 'utf-8',
+                 cwd: (str, Path) = None) -> Dict[str, bytes]:
+    """Return the graph rendered in each format, laid out only once."""
+    formats = list(dict.fromkeys(formats))
+    if not formats:
+        return {}
+    with formats_command(engine, formats) as (cmd, collect):
+        return collect(run_graphviz(cmd, source.encode(encoding), cwd))
+
+
+def pipe_many(sources: Sequence[str],
+              formats: Sequence[str],
+              engine: str = 'dot',
+              encoding: str = 'utf-8',
+              batch_size: int = 100,
+              cwd: (str, Path) = None
+              ) -> List[Union[Dict[str, bytes], Exception]]:
+    """Return each graph rendered in each format, see pipe_formats().
+
+    Up to batch_size graphs are fed to one Graphviz process, which lays out
+    each of them once for all formats, instead of starting a process per
+    graph. If a batch fails, its graphs are rendered one by one, and the
+    error of each failing graph is returned in place of its images.
+    """
+    formats = list(dict.fromkeys(formats))
+    results = []
+    for i in range(0, len(sources), batch_size):
+        batch = sources[i:i + batch_size]
+        try:
+            if len(batch) == 1 or any(f not in BATCH_FORMATS
+                                      for f in formats):
+                raise ValueError(formats)  # render one by one
+            rendered = {f: split_output(data, f) for f, data in
+                        pipe_formats('\n'.join(batch), formats, engine,
+                                     encoding, cwd).items()}
+            for f, images in rendered.items():
+                if len(images) != len(batch):
+                    raise Exception(f'Graphviz rendered {len(images)} of '
+                                    f'{len(batch)} graphs as {f}')
+            results.extend({f: rendered[f][j] for f in formats}
+                           for j in range(len(batch)))
+        except Exception:
+            for source in batch:
+                try:
+                    results.append(pipe_formats(source, formats, engine,
+                                                encoding, cwd))
+                except Exception as error:
+                    results.append(error)
+    return results
+
+
+@functools.lru_cache()
+def graphviz_version(engine: str = 'dot') -> str:
+    """Return the version banner of the Graphviz engine, e.g. for cache keys."""
+    import subprocess
+    try:
+        proc = subprocess.run([engine, '-V'], stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        from graphviz import ExecutableNotFound
+        raise ExecutableNotFound([engine, '-V'])
+    # dot prints its version to stderr
+    return (proc.stderr or proc.stdout).decode(errors='replace').strip()
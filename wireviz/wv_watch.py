@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Keep a harness rendered while its source files are being edited."""
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from .Harness import Harness
+from .wireviz import wireviz, COMMON_LIB
+from .wv_cache import MemoryRenderCache, get_render_cache, set_render_cache
+
+
+def watched_files(srcfile: Path,
+                  use_common_lib: bool,
+                  prepend_file: Tuple[Path, ...] = None,
+                  harness: Optional[Harness] = None,
+                  image_dir: Path = None) -> Iterable[Path]:
+    """List the files a rendering of srcfile depends on.
+
+    Relative image paths are resolved against image_dir, the directory
+    Graphviz renders in, which defaults to the directory of srcfile.
+    """
+    files = [srcfile]
+    if use_common_lib:
+        files.append(COMMON_LIB)
+    files.extend(prepend_file or [])
+    if harness is not None:
+        for part in (*harness.connectors.values(), *harness.cables.values()):
+            if part.image:
+                files.append((image_dir or srcfile.parent) / part.image.src)
+    return list(dict.fromkeys(files))
+
+
+def snapshot(files: Iterable[Path]) -> Dict[Path, tuple]:
+    state = {}
+    for file in files:
+        try:
+            stat = os.stat(file)
+            state[file] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state[file] = None
+    return state
+
+
+def wait_for_change(files: Iterable[Path],
+                    interval: float = 0.5,
+                    settle: float = 0.3) -> None:
+    """Return once the files have changed and then stayed unchanged for
+    settle seconds, so that a burst of saves causes a single re-render."""
+    files = list(files)
+    before = snapshot(files)
+    while True:
+        time.sleep(interval)
+        current = snapshot(files)
+        if current != before:
+            break
+    while True:
+        time.sleep(settle)
+        latest = snapshot(files)
+        if latest == current:
+            return
+        current = latest
+
+
+def watch(srcfile: Path,
+          use_common_lib: bool,
+          outfile: Path = None,
+          prepend_file: Tuple[Path, ...] = None,
+          interval: float = 0.5,
+          settle: float = 0.3,
+          **options) -> None:
+    """Render srcfile, then render it again whenever its sources change.
+
+    The sources are srcfile, the prepended libraries, and the images used by
+    the harness. Parsed libraries, image sizes and the images rendered for
+    unchanged graphs are kept between iterations. Runs until interrupted.
+
+    Args:
+        srcfile, use_common_lib, outfile, prepend_file, options: see wireviz()
+        interval: seconds between checks for changes
+        settle: seconds the files must stay unchanged before re-rendering
+    """
+    # The keys of rendered images cover the contents of the images, resolved
+    # against the output directory like the watched ones, so an edited image
+    # is rendered again while an unchanged graph is not
+    if get_render_cache() is None:
+        set_render_cache(MemoryRenderCache())
+    out_dir = (outfile or srcfile).parent
+    harness = None
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                harness = wireviz(srcfile, use_common_lib, outfile,
+                                  prepend_file, **options)
+            except Exception as error:
+                print(f'FAILED  {srcfile}: {type(error).__name__}: {error}')
+            else:
+                print(f'OK      {srcfile} '
+                      f'({time.perf_counter() - start:.2f} s)')
+            files = watched_files(srcfile, use_common_lib, prepend_file,
+                                  harness, out_dir)
+            print(f'Watching {len(files)} files, press Ctrl+C to stop')
+            wait_for_change(files, interval, settle)
+    except KeyboardInterrupt:
+        pass